@@ -1,19 +1,69 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse, RedirectResponse
 from uvicorn import run as app_run
 
+import asyncio
+import numpy as np
+from contextlib import asynccontextmanager
 from typing import Optional
 from pathlib import Path
 
-from us_visa.constants import APP_HOST, APP_PORT
-from us_visa.pipeline.prediction_pipeline import USVisaData, USVisaClassifier
-from us_visa.pipeline.training_pipeline import TrainPipeline
+from us_visa.constants import APP_HOST, APP_PORT, APP_WORKERS
+from us_visa.entity.config_entity import USVisaPredictionConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.metrics import ERRORS, PREDICTIONS, STAGE_LATENCY, registry
+from us_visa.pipeline.prediction_pipeline import USVisaData, USVisaArrowData, USVisaClassifier
+from us_visa.pipeline.micro_batcher import PredictionBatcher
+from us_visa.pipeline.inference_executor import InferenceExecutor, InferenceOverloadedError
+from us_visa.pipeline.training_jobs import TrainingJobManager, TrainingQueueFullError
 
-app = FastAPI()
+prediction_config = USVisaPredictionConfig()
+inference_executor = InferenceExecutor(kind=prediction_config.executor_kind,
+                                       max_workers=prediction_config.executor_max_workers,
+                                       max_pending=prediction_config.executor_max_pending)
+training_job_manager = TrainingJobManager()
+prediction_batcher = PredictionBatcher(predict_fn=USVisaClassifier(prediction_config).predict,
+                                       max_batch_size=prediction_config.batcher_max_batch_size,
+                                       max_wait_seconds=prediction_config.batcher_max_wait_seconds,
+                                       executor=inference_executor,
+                                       max_queue_depth=prediction_config.executor_max_pending)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+model_status = {"ready": False, "model_version": None, "load_seconds": None, "loaded_at": None, "error": None}
+
+
+async def warm_up_model():
+    """
+    Loads the production model and runs a synthetic batch on every inference worker,
+    retrying until it succeeds. The service reports ready only afterwards.
+    """
+    model_predictor = USVisaClassifier(prediction_config)
+    while True:
+        try:
+            results = await asyncio.gather(*[inference_executor.run(model_predictor.warm_up)
+                                             for _ in range(inference_executor.max_workers)])
+            model_status.update(results[0], ready=True, error=None)
+            return
+        except Exception as e:
+            model_status["error"] = f"{e}"
+            await asyncio.sleep(prediction_config.warmup_retry_seconds)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_task = asyncio.ensure_future(warm_up_model())
+    yield
+    warm_up_task.cancel()
+    inference_executor.shutdown(wait=False)
+    training_job_manager.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 # BASE_DIR = Path("us_visa").resolve().parent
 app.mount("/static", StaticFiles(directory="static"), name="static")
 # app.mount("/static", StaticFiles(directory=Path(BASE_DIR, '/static')), name="static")
@@ -58,6 +108,16 @@ class DataForm:
         self.unit_of_wage = form.get("unit_of_wage")
         self.full_time_position = form.get("full_time_position")
 
+@app.get("/health/live")
+async def liveRouteClient():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readyRouteClient():
+    return JSONResponse(model_status, status_code=200 if model_status["ready"] else 503)
+
+
 @app.get("/", tags=["authentication"])
 async def index(request: Request):
 
@@ -66,23 +126,50 @@ async def index(request: Request):
 
 
 @app.get("/train")
-async def trainRouteClient():
+@app.post("/train")
+async def trainRouteClient(full_resync: bool = False):
+    """
+    Submits a training run in the background and returns its job, poll /train/{job_id} for progress.
+    full_resync=true rebuilds the feature store from the whole collection.
+    """
     try:
-        train_pipeline = TrainPipeline()
+        job = training_job_manager.submit(full_resync=full_resync)
 
-        train_pipeline.run_pipeline()
-
-        return Response("Training successful !!")
+        return JSONResponse(job.to_dict(), status_code=202)
 
+    except TrainingQueueFullError as e:
+        return Response(f"{e}", status_code=503)
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/train/jobs")
+async def trainJobsRouteClient():
+    return [job.to_dict() for job in training_job_manager.list_jobs()]
+
+
+@app.get("/train/{job_id}")
+async def trainJobRouteClient(job_id: str):
+    job = training_job_manager.get(job_id)
+    if job is None:
+        return Response(f"Unknown training job {job_id}", status_code=404)
+    return job.to_dict()
+
+
+@app.delete("/train/{job_id}")
+async def cancelTrainJobRouteClient(job_id: str):
+    job = training_job_manager.cancel(job_id)
+    if job is None:
+        return Response(f"Unknown training job {job_id}", status_code=404)
+    return job.to_dict()
+
+
 @app.post("/")
 async def predictRouteClient(request: Request):
     try:
         form = DataForm(request)
-        await form.get_usvisa_data()
+        with STAGE_LATENCY.time("form_parse"):
+            await form.get_usvisa_data()
         
         usvisa_data = USVisaData(
                                 continent= form.continent,
@@ -97,11 +184,11 @@ async def predictRouteClient(request: Request):
                                 full_time_position= form.full_time_position,
                                 )
         
-        usvisa_df = usvisa_data.get_usvisa_input_data_frame()
-
-        model_predictor = USVisaClassifier()
+        with STAGE_LATENCY.time("dataframe_build"):
+            usvisa_df = usvisa_data.get_usvisa_input_data_frame()
 
-        value = model_predictor.predict(dataframe=usvisa_df)[0]
+        value = (await prediction_batcher.predict(usvisa_df))[0]
+        PREDICTIONS.inc(TargetValueMapping().reverse_mapping()[int(value)])
 
         status = None
         if value == 1:
@@ -109,14 +196,122 @@ async def predictRouteClient(request: Request):
         else:
             status = "Visa Not-Approved"
 
-        return templates.TemplateResponse(
-            "usvisa.html",
-            {"request": request, "context": status},
-        )
+        with STAGE_LATENCY.time("template_render"):
+            return templates.TemplateResponse(
+                "usvisa.html",
+                {"request": request, "context": status},
+            )
         
+    except InferenceOverloadedError as e:
+        ERRORS.inc("predict")
+        return Response(f"{e}", status_code=503)
+    except Exception as e:
+        ERRORS.inc("predict")
+        return {"status": False, "error": f"{e}"}
+
+
+@app.post("/predict/batch")
+async def predictBatchRouteClient(request: Request, chunk_size: Optional[int] = None):
+    """
+    Scores many applicant records in one call.
+    Body is either a JSON list of records, a JSON object with a "records" list,
+    or NDJSON (one record per line) when sent with an ndjson content type.
+    """
+    try:
+        body = await request.body()
+
+        model_predictor = USVisaClassifier(prediction_config)
+
+        # parsing a large body blocks, it runs on the inference executor together with the scoring
+        predictions = await inference_executor.run(model_predictor.predict_batch_payload, payload=body,
+                                                   ndjson="ndjson" in request.headers.get("content-type", ""),
+                                                   chunk_size=chunk_size)
+
+        for label in set(predictions):
+            PREDICTIONS.inc(label, amount=predictions.count(label))
+
+        return {"status": True, "predictions": predictions}
+
+    except InferenceOverloadedError as e:
+        ERRORS.inc("predict_batch")
+        return Response(f"{e}", status_code=503)
     except Exception as e:
+        ERRORS.inc("predict_batch")
         return {"status": False, "error": f"{e}"}
 
 
+@app.post("/predict/arrow")
+async def predictArrowRouteClient(request: Request, chunk_size: Optional[int] = None):
+    """
+    Scores a columnar batch. Body is an Arrow IPC stream with the ten feature columns,
+    the response is an Arrow IPC stream with one "prediction" column in the same row order.
+    """
+    try:
+        body = await request.body()
+
+        with STAGE_LATENCY.time("dataframe_build"):
+            usvisa_df = USVisaArrowData(payload=body).get_usvisa_input_data_frame()
+
+        model_predictor = USVisaClassifier(prediction_config)
+
+        prediction = await inference_executor.run(model_predictor.predict_batch_codes,
+                                                  dataframe=usvisa_df, chunk_size=chunk_size)
+
+        reverse_mapping = TargetValueMapping().reverse_mapping()
+        for code, count in zip(*np.unique(prediction, return_counts=True)):
+            PREDICTIONS.inc(reverse_mapping[int(code)], amount=int(count))
+
+        return Response(USVisaArrowData.encode_predictions(prediction), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    except InferenceOverloadedError as e:
+        ERRORS.inc("predict_arrow")
+        return Response(f"{e}", status_code=503)
+    except Exception as e:
+        ERRORS.inc("predict_arrow")
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=400)
+
+
+@app.get("/predict/stats")
+async def predictStatsRouteClient():
+    """
+    Micro batcher and prediction cache counters. With the process inference executor predictions are
+    cached in the worker processes, each with its own cache: prediction_cache is then the cache of the
+    worker process answering the call.
+    """
+    stats = prediction_batcher.get_stats()
+    model_predictor = USVisaClassifier(prediction_config)
+    if inference_executor.kind == "process":
+        stats["prediction_cache"] = await inference_executor.run(model_predictor.get_prediction_cache_stats)
+    else:
+        stats["prediction_cache"] = model_predictor.get_prediction_cache_stats()
+    return stats
+
+
+@app.get("/model/version")
+async def modelVersionRouteClient():
+    """
+    Active model version and swap history. With the process inference executor this is the
+    state of the worker process answering the call.
+    """
+    model_predictor = USVisaClassifier(prediction_config)
+    if inference_executor.kind == "process":
+        return await inference_executor.run(model_predictor.get_model_status)
+    return model_predictor.get_model_status()
+
+
+@app.get("/metrics")
+async def metricsRouteClient():
+    """
+    Prometheus text exposition of the stage latencies and counters of this process.
+    With the process inference executor, transform/predict/model_load are observed in the
+    worker processes and are not part of this output.
+    """
+    return Response(registry.render(), media_type=registry.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
-    app_run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
+    if APP_WORKERS > 1:
+        # every worker maps the same model file, see USVisaModelHolder
+        app_run("app:app", host=APP_HOST, port=int(APP_PORT), workers=APP_WORKERS)
+    else:
+        app_run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
@@ -0,0 +1,26 @@
+import argparse
+
+from us_visa.constants import BATCH_PREDICTION_CHUNK_SIZE, BATCH_PREDICTION_N_WORKERS
+from us_visa.entity.config_entity import BatchPredictionConfig
+from us_visa.pipeline.batch_prediction_pipeline import BatchPredictionPipeline
+
+# Rescore a whole case file shaped like notebook/EasyVisa.csv:
+# python batch_predict.py --input notebook/EasyVisa.csv --output predictions.csv
+# python batch_predict.py --input cases.parquet --output predictions.parquet --model artifact/.../model.pkl
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet case file with the USVisa model.")
+    parser.add_argument("--input", required=True, help="Input .csv or .parquet file")
+    parser.add_argument("--output", required=True, help="Output .csv or .parquet file")
+    parser.add_argument("--model", default=None, help="Local model.pkl, the production model in s3 is used otherwise")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_PREDICTION_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BATCH_PREDICTION_N_WORKERS)
+    args = parser.parse_args()
+
+    batch_prediction_config = BatchPredictionConfig(input_file_path=args.input,
+                                                    output_file_path=args.output,
+                                                    local_model_file_path=args.model,
+                                                    chunk_size=args.chunk_size,
+                                                    n_workers=args.workers)
+    n_rows = BatchPredictionPipeline(batch_prediction_config).run_pipeline()
+    print(f"Scored {n_rows} rows into {args.output}")
@@ -0,0 +1,76 @@
+"""
+Throughput of the JSON batch path (/predict/batch) against the Arrow IPC path (/predict/arrow).
+
+    python -m benchmarks.arrow_payload_benchmark
+
+Both paths are timed from the raw request body to the raw response body on EasyVisa records:
+decode, compiled preprocessor transform and encode of the predicted labels. The model predict
+itself is the same for both and left out.
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import CURRENT_YEAR, PREDICTION_INPUT_COLUMNS, SCHEMA_FILE_PATH, TARGET_COLUMN
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.pipeline.prediction_pipeline import USVisaArrowData, USVisaBatchData
+from us_visa.utils.main_utils import read_yaml_file
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+
+
+def time_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    df = pd.read_csv(DATA_FILE_PATH)
+    df["company_age"] = CURRENT_YEAR - df["yr_of_estab"]
+    input_feature_df = df[PREDICTION_INPUT_COLUMNS]
+
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation._schema_config = schema_config
+    preprocessor = data_transformation.get_data_transformer_object()
+    preprocessor.fit(df.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"]))
+    compiled_preprocessor = CompiledPreprocessor.from_column_transformer(preprocessor)
+    reverse_mapping = TargetValueMapping().reverse_mapping()
+
+    for n_rows in (1000, 25000, 100000):
+        records = pd.concat([input_feature_df] * (n_rows // len(input_feature_df) + 1)).iloc[:n_rows]
+        prediction = np.random.RandomState(0).randint(0, 2, n_rows)
+
+        json_body = json.dumps(records.to_dict("records")).encode()
+        table = pa.Table.from_pandas(records, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        arrow_body = sink.getvalue().to_pybytes()
+
+        def json_path():
+            usvisa_df = USVisaBatchData(records=json.loads(json_body)).get_usvisa_input_data_frame()
+            compiled_preprocessor.transform(usvisa_df)
+            return json.dumps({"status": True, "predictions": [reverse_mapping[int(v)] for v in prediction]})
+
+        def arrow_path():
+            usvisa_df = USVisaArrowData(payload=arrow_body).get_usvisa_input_data_frame()
+            compiled_preprocessor.transform(usvisa_df)
+            return USVisaArrowData.encode_predictions(prediction)
+
+        repeat = max(1, 200000 // n_rows)
+        for name, body, path in [("json", json_body, json_path), ("arrow", arrow_body, arrow_path)]:
+            seconds = time_call(path, repeat)
+            print(f"{name:<6}{n_rows:>8} rows  request {len(body) / 2 ** 20:>7.2f} MiB  "
+                  f"{seconds * 1e3:>9.1f} ms  {n_rows / seconds:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Microbenchmark of the compiled (NumPy only) preprocessor against the fitted sklearn ColumnTransformer.
+
+    python -m benchmarks.compiled_preprocessor_benchmark
+
+Fits the preprocessor of DataTransformation on notebook/EasyVisa.csv, checks that both transforms
+agree and prints the mean latency of a single row and of a 10k row batch.
+"""
+import time
+
+import pandas as pd
+
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import CURRENT_YEAR, SCHEMA_FILE_PATH, TARGET_COLUMN
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.utils.main_utils import read_yaml_file
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+
+
+def time_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    df = pd.read_csv(DATA_FILE_PATH)
+    df["company_age"] = CURRENT_YEAR - df["yr_of_estab"]
+    input_feature_df = df.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"])
+
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation._schema_config = schema_config
+    preprocessor = data_transformation.get_data_transformer_object()
+    transformed_arr = preprocessor.fit_transform(input_feature_df)
+
+    compiled_preprocessor = CompiledPreprocessor.from_column_transformer(preprocessor)
+    print(f"parity: {compiled_preprocessor.check_parity(transformed_arr, input_feature_df)}")
+
+    single_row_df = input_feature_df.iloc[[0]]
+    single_row_dict = {column: [value] for column, value in single_row_df.iloc[0].items()}
+    batch_df = input_feature_df.iloc[:10000]
+
+    rows = [
+        ("sklearn single row", time_call(lambda: preprocessor.transform(single_row_df), 500)),
+        ("compiled single row", time_call(lambda: compiled_preprocessor.transform(single_row_dict), 500)),
+        ("sklearn 10k rows", time_call(lambda: preprocessor.transform(batch_df), 20)),
+        ("compiled 10k rows", time_call(lambda: compiled_preprocessor.transform(batch_df), 20)),
+    ]
+    for name, seconds in rows:
+        print(f"{name:<22}{seconds * 1e6:>12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Peak memory of the data stages with and without the schema.yaml dtypes (DataIngestionConfig.schema_dtypes).
+
+    python -m benchmarks.dtype_memory_benchmark --scale 10
+    python -m benchmarks.dtype_memory_benchmark --mongo-url mongodb://localhost:27017
+
+Loads notebook/EasyVisa.csv scale times (unique case_id per copy) into a scratch collection, in mongomock
+(default) or in the mongod at --mongo-url, then runs data ingestion, validation and transformation once
+per dtype policy, each policy in a fresh interpreter. A stage's peak is the growth of the peak resident
+set size (VmHWM, reset through /proc/self/clear_refs, so Linux only) over the resident size the stage
+started with; it covers numpy, pandas and pyarrow buffers alike. Stages pass file paths only, so every
+stage reads its input from the files of the previous one; load_train_set is the peak of reading the train
+file alone. With mongomock the export to the raw file runs in the benchmark process and sets the peak
+of data_ingestion under both policies, --mongo-url leaves only the ingestion itself.
+"""
+import argparse
+import gc
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Callable, Dict
+
+import pandas as pd
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+COLLECTION_NAME = "visa_data_dtype_benchmark"
+POLICIES = {"default": False, "schema": True}
+
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        return int(re.search(rf"^{field}:\s+(\d+) kB", status.read(), re.MULTILINE).group(1))
+
+
+def measure_peak(run: Callable[[], object]) -> (object, float):
+    """
+    :return: result of run, growth of the peak resident set size during run in MB
+    """
+    gc.collect()
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5") # resets VmHWM to the current resident size
+    rss_before = _status_kb("VmRSS")
+    result = run()
+    return result, (_status_kb("VmHWM") - rss_before) / 1024
+
+
+def run_policy(schema_dtypes: bool, args) -> Dict[str, float]:
+    """
+    Runs the data stages in this interpreter
+    :return: MB per stage, and of reading the train set as load_train_set
+    """
+    from us_visa.configuration.mongo_db_connection import MongoDBClient
+    if args.mongo_url is None:
+        import mongomock
+        MongoDBClient.client = mongomock.MongoClient()
+    else:
+        import pymongo
+        MongoDBClient.client = pymongo.MongoClient(args.mongo_url)
+
+    from us_visa.components.data_ingestion import DataIngestion
+    from us_visa.components.data_transformation import DataTransformation
+    from us_visa.components.data_validation import DataValidation
+    from us_visa.constants import DATABASE_NAME
+    from us_visa.data_access.usvisa_data import USVisaData
+    from us_visa.entity.config_entity import DataIngestionConfig, DataTransformationConfig, DataValidationConfig
+    from us_visa.utils.main_utils import load_dataframe
+
+    collection = USVisaData().get_collection(COLLECTION_NAME, DATABASE_NAME)
+    collection.drop()
+    df = pd.read_csv(DATA_FILE_PATH)
+    for copy in range(args.scale):
+        collection.insert_many(df.assign(case_id=df["case_id"] + f"_{copy}").to_dict("records"))
+    del df
+
+    peaks = {}
+    try:
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            data_ingestion_config = DataIngestionConfig(artifact_dir=artifact_dir, collection_name=COLLECTION_NAME,
+                                                        incremental=False, streaming_export=True,
+                                                        schema_dtypes=schema_dtypes)
+            data_ingestion_artifact, peaks["data_ingestion"] = measure_peak(
+                DataIngestion(data_ingestion_config).initiate_data_ingestion)
+            data_validation_artifact, peaks["data_validation"] = measure_peak(
+                DataValidation(data_ingestion_artifact, DataValidationConfig(artifact_dir=artifact_dir))
+                .initiate_data_validation)
+            _, peaks["data_transformation"] = measure_peak(
+                DataTransformation(data_ingestion_artifact, DataTransformationConfig(artifact_dir=artifact_dir),
+                                   data_validation_artifact).initiate_data_transformation)
+            _, peaks["load_train_set"] = measure_peak(
+                lambda: load_dataframe(data_ingestion_artifact.trained_file_path))
+    finally:
+        collection.drop()
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="Copies of EasyVisa.csv loaded")
+    parser.add_argument("--mongo-url", default=None, help="mongod to use instead of mongomock")
+    parser.add_argument("--policy", choices=list(POLICIES), default=None,
+                        help="Run one policy in this interpreter and print its peaks as json")
+    args = parser.parse_args()
+
+    if args.policy is not None:
+        print(json.dumps(run_policy(POLICIES[args.policy], args)))
+        return
+
+    results = {}
+    for policy in POLICIES:
+        command = [sys.executable, "-m", "benchmarks.dtype_memory_benchmark", "--policy", policy,
+                   "--scale", str(args.scale)] + ([] if args.mongo_url is None else ["--mongo-url", args.mongo_url])
+        output = subprocess.run(command, capture_output=True, text=True, check=True,
+                                env=dict(os.environ, PYTHONWARNINGS="ignore")).stdout
+        results[policy] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{len(pd.read_csv(DATA_FILE_PATH)) * args.scale} records, peak resident set growth per stage")
+    print(f"{'stage':<22}{'default MB':>12}{'schema MB':>12}{'reduction':>11}")
+    for stage in ["data_ingestion", "data_validation", "data_transformation", "load_train_set"]:
+        default, schema = results["default"][stage], results["schema"][stage]
+        print(f"{stage:<22}{default:>12.1f}{schema:>12.1f}{1 - schema / default:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Microbenchmark of the flattened forest against the sklearn RandomForestClassifier it was exported from.
+
+    python -m benchmarks.flat_forest_benchmark
+
+Fits the preprocessor of DataTransformation and a forest with the largest grid of config/model.yaml on
+notebook/EasyVisa.csv, checks exact parity and prints the pickled size and the mean latency of a
+single row, a 64 row micro batch, batches around the crossover and a 10k row batch, for the sklearn
+forest, the flat forest and the HybridForestClassifier the trainer exports by default (flat forest up to
+MODEL_TRAINER_FLAT_FOREST_MAX_ROWS rows, sklearn forest above). The hybrid pickles both forests.
+"""
+import pickle
+import time
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import CURRENT_YEAR, MODEL_TRAINER_FLAT_FOREST_MAX_ROWS, SCHEMA_FILE_PATH, TARGET_COLUMN
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.entity.flat_forest import FlatForestClassifier, HybridForestClassifier
+from us_visa.utils.main_utils import read_yaml_file
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+
+
+def time_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    df = pd.read_csv(DATA_FILE_PATH)
+    df["company_age"] = CURRENT_YEAR - df["yr_of_estab"]
+    input_feature_df = df.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"])
+    target = df[TARGET_COLUMN].replace(TargetValueMapping()._asdict()).astype(int)
+
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation._schema_config = schema_config
+    transformed_arr = data_transformation.get_data_transformer_object().fit_transform(input_feature_df)
+
+    forest = RandomForestClassifier(n_estimators=9, max_depth=20, max_features="sqrt", random_state=0)
+    forest.fit(transformed_arr, target)
+    flat_forest = FlatForestClassifier.from_random_forest(forest)
+    hybrid_forest = HybridForestClassifier(forest, flat_forest, max_flat_rows=MODEL_TRAINER_FLAT_FOREST_MAX_ROWS)
+    print(f"parity: {flat_forest.check_parity(forest, transformed_arr)}")
+    print(f"pickled size: sklearn {len(pickle.dumps(forest)) / 1024:.0f} KiB, "
+          f"flat {len(pickle.dumps(flat_forest)) / 1024:.0f} KiB, "
+          f"hybrid {len(pickle.dumps(hybrid_forest)) / 1024:.0f} KiB")
+
+    rows = []
+    for n_rows, repeat in [(1, 500), (64, 200), (256, 50), (1024, 20), (10000, 10)]:
+        batch = transformed_arr[:n_rows]
+        rows.append((f"sklearn {n_rows} rows", time_call(lambda: forest.predict(batch), repeat)))
+        rows.append((f"flat {n_rows} rows", time_call(lambda: flat_forest.predict(batch), repeat)))
+        rows.append((f"hybrid {n_rows} rows", time_call(lambda: hybrid_forest.predict(batch), repeat)))
+    for name, seconds in rows:
+        print(f"{name:<22}{seconds * 1e6:>12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
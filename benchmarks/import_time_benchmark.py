@@ -0,0 +1,80 @@
+"""
+Import time of the serving module graph (app.py), measured with python -X importtime.
+
+    python -m benchmarks.import_time_benchmark --budget 1.5
+
+Every uvicorn worker pays this before it accepts connections. The training stack (scikit-learn, scipy,
+evidently, imblearn, neuro_mf, pymongo and the pipeline components) must stay out of it: training
+runs in its own process and the model's own dependencies load with the model in the background.
+Exits with status 1 when the import exceeds the budget or pulls in a training module, so it can
+guard the budget in CI.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULE = "app"
+# top level packages and us_visa modules that only training needs
+TRAINING_ONLY_MODULES = ["sklearn", "scipy", "evidently", "imblearn", "neuro_mf", "pymongo", "dill",
+                         "us_visa.components", "us_visa.pipeline.training_pipeline",
+                         "us_visa.configuration.mongo_db_connection", "us_visa.data_access"]
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    Imports module in a fresh interpreter
+    :return: wall time of the import, own import time (us) of every imported module
+    """
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"), check=True)
+    self_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        self_us[name.strip()] = int(own)
+    return float(result.stdout.strip().splitlines()[-1]), self_us
+
+
+def training_modules_imported(modules: List[str]) -> List[str]:
+    """
+    :return: Entries of TRAINING_ONLY_MODULES of which at least one module got imported
+    """
+    return [forbidden for forbidden in TRAINING_ONLY_MODULES
+            if any(name == forbidden or name.startswith(forbidden + ".") for name in modules)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1.5, help="Import time budget in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters measured, the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Top level packages listed by cumulative time")
+    args = parser.parse_args()
+
+    runs = [measure_import(MODULE) for _ in range(args.runs)]
+    seconds, self_us = min(runs, key=lambda run: run[0])
+
+    # cumulative time of the top level packages (a package's first import covers its submodules)
+    packages: Dict[str, int] = {}
+    for name, own in self_us.items():
+        packages[name.split(".")[0]] = packages.get(name.split(".")[0], 0) + own
+    print(f"import {MODULE}: {seconds:.3f} s (budget {args.budget:.3f} s), {len(self_us)} modules")
+    for package, total in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<24}{total / 1e3:>9.1f} ms")
+
+    failures = []
+    if seconds > args.budget:
+        failures.append(f"import took {seconds:.3f} s, over the {args.budget:.3f} s budget")
+    leaked = training_modules_imported(list(self_us))
+    if leaked:
+        failures.append(f"training only modules imported: {', '.join(leaked)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
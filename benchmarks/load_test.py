@@ -0,0 +1,193 @@
+"""
+Offline load test of app.py.
+
+    python -m benchmarks.load_test --concurrency 8 --requests 2000 --batch-size 256
+
+Starts a local S3 stand-in (moto server), trains a small USVisaModel on notebook/EasyVisa.csv and
+pushes it to MODEL_BUCKET_NAME, then runs the app with uvicorn in a subprocess pointed at the stand-in
+through AWS_S3_ENDPOINT_URL. Serving does not touch MongoDB, so no Mongo stand-in is needed.
+
+Reports the cold start (process spawn to first successful prediction) and, per route, throughput and
+p50/p95/p99 latency at the given concurrency. Needs no network access besides localhost.
+"""
+import argparse
+import http.client
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, List, Tuple
+from urllib.parse import urlencode
+
+import boto3
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from moto.server import ThreadedMotoServer
+from sklearn.ensemble import RandomForestClassifier
+
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import (AWS_S3_ENDPOINT_URL_ENV_KEY, CURRENT_YEAR, MODEL_BUCKET_NAME, MODEL_FILE_NAME,
+                               PREDICTION_INPUT_COLUMNS, REGION_NAME, SCHEMA_FILE_PATH, TARGET_COLUMN)
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.entity.estimator import TargetValueMapping, USVisaModel
+from us_visa.utils.main_utils import read_yaml_file
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+HOST = "127.0.0.1"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def build_model(df: pd.DataFrame) -> USVisaModel:
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    input_feature_df = df.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"])
+    target = df[TARGET_COLUMN].replace(TargetValueMapping()._asdict()).astype(int)
+
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation._schema_config = schema_config
+    preprocessor = data_transformation.get_data_transformer_object()
+    transformed_arr = preprocessor.fit_transform(input_feature_df)
+    forest = RandomForestClassifier(n_estimators=9, max_depth=15, random_state=0).fit(transformed_arr, target)
+    return USVisaModel(preprocessing_object=preprocessor, trained_model_object=forest,
+                       compiled_preprocessing_object=CompiledPreprocessor.from_column_transformer(preprocessor))
+
+
+def request(connection: http.client.HTTPConnection, method: str, path: str, body: bytes = None,
+            content_type: str = None) -> Tuple[int, bytes]:
+    headers = {"content-type": content_type} if content_type else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def run_load(port: int, concurrency: int, n_requests: int, make_request: Callable) -> Tuple[float, List[float], int]:
+    """
+    Sends n_requests calls of make_request(connection) from concurrency threads with keep-alive connections
+    :return: wall time, latency of every call, number of failed calls
+    """
+    latencies, failures = [], [0]
+    remaining = [n_requests]
+    lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection(HOST, port, timeout=60)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                ok = make_request(connection)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(HOST, port, timeout=60)
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                failures[0] += not ok
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, failures[0]
+
+
+def is_rendered_page(status: int, body: bytes) -> bool:
+    # failures of the form route come back as a JSON body with status 200
+    return status == 200 and not body.lstrip().startswith(b"{")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client connections")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per route")
+    parser.add_argument("--batch-size", type=int, default=256, help="Records per batch route request")
+    parser.add_argument("--routes", default="form,batch,arrow", help="Comma separated subset of form,batch,arrow")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn worker processes")
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_FILE_PATH)
+    df["company_age"] = CURRENT_YEAR - df["yr_of_estab"]
+    records = df[PREDICTION_INPUT_COLUMNS]
+
+    s3_port = free_port()
+    s3_server = ThreadedMotoServer(ip_address=HOST, port=s3_port)
+    s3_server.start()
+    app_process = None
+    try:
+        env = dict(os.environ, AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing",
+                   **{AWS_S3_ENDPOINT_URL_ENV_KEY: f"http://{HOST}:{s3_port}"})
+        s3 = boto3.client("s3", region_name=REGION_NAME, endpoint_url=env[AWS_S3_ENDPOINT_URL_ENV_KEY],
+                          aws_access_key_id="testing", aws_secret_access_key="testing")
+        s3.create_bucket(Bucket=MODEL_BUCKET_NAME)
+        s3.put_object(Bucket=MODEL_BUCKET_NAME, Key=MODEL_FILE_NAME, Body=pickle.dumps(build_model(df)))
+
+        form_body = urlencode({column: str(value) for column, value in records.iloc[0].items()}).encode()
+        batch = records.iloc[:args.batch_size]
+        json_body = json.dumps(batch.to_dict("records")).encode()
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        arrow_body = sink.getvalue().to_pybytes()
+
+        routes = {
+            "form": lambda c: is_rendered_page(*request(c, "POST", "/", form_body, "application/x-www-form-urlencoded")),
+            "batch": lambda c: json.loads(request(c, "POST", "/predict/batch", json_body,
+                                                  "application/json")[1]).get("status") is True,
+            "arrow": lambda c: request(c, "POST", "/predict/arrow", arrow_body,
+                                       "application/vnd.apache.arrow.stream")[0] == 200,
+        }
+
+        app_port = free_port()
+        start = time.perf_counter()
+        app_process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--host", HOST,
+                                        "--port", str(app_port), "--workers", str(args.app_workers),
+                                        "--log-level", "warning"], env=env)
+        while True:
+            if app_process.poll() is not None:
+                raise RuntimeError("app process exited during start up")
+            connection = http.client.HTTPConnection(HOST, app_port, timeout=60)
+            try:
+                if routes["form"](connection):
+                    break
+            except (OSError, http.client.HTTPException):
+                pass
+            finally:
+                connection.close()
+            # not listening yet, or the model is not loaded yet and the form route answered with its error body
+            time.sleep(0.05)
+        print(f"cold start to first prediction: {time.perf_counter() - start:.2f} s")
+
+        print(f"{'route':<8}{'requests':>9}{'failed':>8}{'req/s':>10}{'rows/s':>11}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for route in args.routes.split(","):
+            rows_per_request = 1 if route == "form" else args.batch_size
+            wall, latencies, failures = run_load(app_port, args.concurrency, args.requests, routes[route])
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+            print(f"{route:<8}{len(latencies):>9}{failures:>8}{len(latencies) / wall:>10.1f}"
+                  f"{len(latencies) * rows_per_request / wall:>11.0f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}")
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait()
+        s3_server.stop()
+
+
+if __name__ == "__main__":
+    main()
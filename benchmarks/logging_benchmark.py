@@ -0,0 +1,71 @@
+"""
+Per request logging overhead of the previous synchronous file logging against the queue based setup
+of us_visa.logger.
+
+    python -m benchmarks.logging_benchmark
+
+One simulated request emits the hot path records of a single form prediction (USVisaData,
+USVisaClassifier.predict and USVisaModel.predict). Times are measured in the calling thread, i.e.
+what a request pays; with the queue the file writes happen on the listener thread.
+"""
+import logging
+import os
+import tempfile
+import time
+
+from us_visa.logger import configure_logging, hot_path_logging, logs_path, stop_logging
+
+N_REQUESTS = 20000
+HOT_PATH_RECORDS_PER_REQUEST = 7
+
+
+def simulate_request(rows: int) -> None:
+    for _ in range(HOT_PATH_RECORDS_PER_REQUEST - 1):
+        hot_path_logging.info("Entered predict method of USVisaModel class")
+    hot_path_logging.info("Used the trained model to get predictions", extra={"rows": rows})
+
+
+def time_requests() -> float:
+    start = time.perf_counter()
+    for i in range(N_REQUESTS):
+        simulate_request(i)
+    return (time.perf_counter() - start) / N_REQUESTS
+
+
+def configure_synchronous(log_file_path: str) -> None:
+    """
+    The logging setup before the queue: basicConfig(filename=..., level=DEBUG)
+    """
+    stop_logging()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+    logging.basicConfig(filename=log_file_path, format="[%(asctime)s ]%(name)s-%(levelname)s-%(message)s",
+                        level=logging.DEBUG)
+    hot_path_logging.sample_rate = 1.0
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows = []
+
+        configure_synchronous(os.path.join(tmp_dir, "sync.log"))
+        rows.append(("synchronous file, DEBUG", time_requests()))
+
+        for name, level, sample_rate in [("queue, INFO", "INFO", 1.0),
+                                         ("queue, INFO, 10% sampled", "INFO", 0.1),
+                                         ("queue, WARNING", "WARNING", 1.0)]:
+            configure_logging(level=level, sample_rate=sample_rate,
+                              log_file_path=os.path.join(tmp_dir, f"{len(rows)}.log"))
+            rows.append((name, time_requests()))
+            stop_logging()
+
+        for name, seconds in rows:
+            print(f"{name:<28}{seconds * 1e6:>10.1f} us/request")
+
+    configure_logging(log_file_path=logs_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Private memory per worker of a model loaded from a memory mapped joblib file (MODEL_CACHE_MMAP_DIR)
+against a plain load, for every scoring engine the trainer can export.
+
+    python -m benchmarks.mmap_sharing_benchmark --workers 4 --n-estimators 50
+
+Fits the preprocessor of DataTransformation on notebook/EasyVisa.csv, then a RandomForestClassifier and
+a KNeighborsClassifier, dumps each engine with joblib like USVisaModelHolder does and starts --workers
+processes that load it (mmap_mode="r" or not) and score 100 rows. A worker reports the growth of its
+private memory (Private_Clean + Private_Dirty of /proc/self/smaps_rollup, so Linux only) while all the
+workers hold the model; pages of the mapped file read by several workers are shared and not counted.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
+
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import CURRENT_YEAR, SCHEMA_FILE_PATH, TARGET_COLUMN
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.entity.fast_knn import BlockedKNeighborsClassifier
+from us_visa.entity.flat_forest import FlatForestClassifier, HybridForestClassifier
+from us_visa.utils.main_utils import read_yaml_file
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+
+
+def private_mb() -> float:
+    with open("/proc/self/smaps_rollup") as smaps:
+        sizes = dict(re.findall(r"^(Private_Clean|Private_Dirty):\s+(\d+) kB", smaps.read(), re.MULTILINE))
+    return sum(int(size) for size in sizes.values()) / 1024
+
+
+def load_and_score(file_path: str, mmap: bool, X: np.ndarray, loaded: multiprocessing.Barrier,
+                   results: multiprocessing.Queue) -> None:
+    before = private_mb()
+    model = joblib.load(file_path, mmap_mode="r" if mmap else None)
+    model.predict(X)
+    # a page is shared only while several workers map it, all of them hold the model when measuring
+    loaded.wait()
+    results.put(private_mb() - before)
+    loaded.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Processes loading the same file")
+    parser.add_argument("--n-estimators", type=int, default=50, help="Trees of the forest")
+    args = parser.parse_args()
+
+    schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+    df = pd.read_csv(DATA_FILE_PATH)
+    df["company_age"] = CURRENT_YEAR - df["yr_of_estab"]
+    input_feature_df = df.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"])
+    target = df[TARGET_COLUMN].replace(TargetValueMapping()._asdict()).astype(int)
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation._schema_config = schema_config
+    X = data_transformation.get_data_transformer_object().fit_transform(input_feature_df)
+
+    forest = RandomForestClassifier(n_estimators=args.n_estimators, random_state=0).fit(X, target)
+    flat_forest = FlatForestClassifier.from_random_forest(forest)
+    knn = KNeighborsClassifier().fit(X, target)
+    engines = {
+        "sklearn forest": forest,
+        "hybrid forest": HybridForestClassifier(forest, flat_forest, max_flat_rows=256),
+        "flat forest": flat_forest,
+        "sklearn knn": knn,
+        "blocked knn": BlockedKNeighborsClassifier.from_kneighbors(knn),
+    }
+
+    context = multiprocessing.get_context("spawn")
+    print(f"private MB per worker, {args.workers} workers")
+    print(f"{'engine':<16}{'file MB':>9}{'load':>8}{'mmap':>8}")
+    with tempfile.TemporaryDirectory() as mmap_dir:
+        for name, engine in engines.items():
+            file_path = os.path.join(mmap_dir, "model.joblib")
+            joblib.dump(engine, file_path)
+            private = {}
+            for mmap in (False, True):
+                loaded, results = context.Barrier(args.workers), context.Queue()
+                workers = [context.Process(target=load_and_score, args=(file_path, mmap, X[:100], loaded, results))
+                           for _ in range(args.workers)]
+                for worker in workers:
+                    worker.start()
+                private[mmap] = np.mean([results.get() for _ in workers])
+                for worker in workers:
+                    worker.join()
+            print(f"{name:<16}{os.path.getsize(file_path) / 2 ** 20:>9.1f}{private[False]:>8.1f}{private[True]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
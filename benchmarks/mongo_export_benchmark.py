@@ -0,0 +1,76 @@
+"""
+Throughput of the feature store export (USVisaData.export_collection_to_csv) by degree of parallelism.
+
+    python -m benchmarks.mongo_export_benchmark --scale 10 --parallelism 1,2,4,8
+    python -m benchmarks.mongo_export_benchmark --mongo-url mongodb://localhost:27017
+
+Loads notebook/EasyVisa.csv scale times (unique case_id per copy) into a scratch collection, either in
+mongomock (default, no server needed) or in the mongod at --mongo-url, then exports it once per
+parallelism. Every partitioned export must produce the same file. mongomock runs in the calling
+process, under the GIL, so it only shows the partitioning overhead; the concurrent reads pay off
+against a real server, where each partition waits on its own pooled connection.
+"""
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from us_visa.components.data_ingestion import DataIngestion
+from us_visa.configuration.mongo_db_connection import MongoDBClient
+from us_visa.constants import DATA_INGESTION_EXPORT_BATCH_SIZE, DATABASE_NAME
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+COLLECTION_NAME = "visa_data_export_benchmark"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=4, help="Copies of EasyVisa.csv loaded")
+    parser.add_argument("--parallelism", default="1,2,4,8", help="Comma separated partition counts")
+    parser.add_argument("--batch-size", type=int, default=DATA_INGESTION_EXPORT_BATCH_SIZE)
+    parser.add_argument("--mongo-url", default=None, help="mongod to use instead of mongomock")
+    args = parser.parse_args()
+
+    if args.mongo_url is None:
+        import mongomock
+        MongoDBClient.client = mongomock.MongoClient()
+    else:
+        import pymongo
+        MongoDBClient.client = pymongo.MongoClient(args.mongo_url)
+
+    from us_visa.data_access.usvisa_data import USVisaData
+
+    usvisa_data = USVisaData()
+    collection = usvisa_data.get_collection(COLLECTION_NAME, DATABASE_NAME)
+    collection.drop()
+    df = pd.read_csv(DATA_FILE_PATH)
+    for copy in range(args.scale):
+        collection.insert_many(df.assign(case_id=df["case_id"] + f"_{copy}").to_dict("records"))
+    columns = DataIngestion.get_schema_columns()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            reference_file_path = None
+            print(f"{collection.count_documents({})} documents, batch size {args.batch_size}")
+            print(f"{'partitions':>10}{'seconds':>10}{'docs/s':>12}  output")
+            for n_partitions in map(int, args.parallelism.split(",")):
+                file_path = os.path.join(tmp_dir, f"export_{n_partitions}.csv")
+                start = time.perf_counter()
+                n_records = usvisa_data.export_collection_to_csv(COLLECTION_NAME, file_path, columns,
+                                                                 args.batch_size, database_name=DATABASE_NAME,
+                                                                 n_partitions=n_partitions, with_id=True)
+                seconds = time.perf_counter() - start
+                if reference_file_path is None:
+                    reference_file_path, output = file_path, "reference"
+                else:
+                    output = "identical" if filecmp.cmp(reference_file_path, file_path, shallow=False) else "DIFFERENT"
+                print(f"{n_partitions:>10}{seconds:>10.2f}{n_records / seconds:>12.0f}  {output}")
+    finally:
+        collection.drop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from us_visa.components.data_transformation import DataTransformation
+from us_visa.constants import CURRENT_YEAR, SCHEMA_FILE_PATH, TARGET_COLUMN
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.utils.main_utils import apply_schema_dtypes, drop_columns, read_yaml_file
+
+DATA_FILE_PATH = "notebook/EasyVisa.csv"
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    return read_yaml_file(file_path=SCHEMA_FILE_PATH)
+
+
+@pytest.fixture(scope="module")
+def input_features(schema_config):
+    df = pd.read_csv(DATA_FILE_PATH).drop(columns=[TARGET_COLUMN])
+    df["company_age"] = CURRENT_YEAR - df["yr_of_estab"]
+    return drop_columns(df=df, cols=schema_config["drop_columns"])
+
+
+@pytest.fixture(scope="module")
+def fitted(schema_config, input_features):
+    # only the schema is needed to build the preprocessor, not the artifacts of the previous stages
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation._schema_config = schema_config
+    preprocessor = data_transformation.get_data_transformer_object().fit(input_features)
+    return preprocessor, CompiledPreprocessor.from_column_transformer(preprocessor)
+
+
+def assert_same_output(preprocessor, compiled_preprocessor, data):
+    expected = preprocessor.transform(pd.DataFrame(data))
+    if hasattr(expected, "toarray"):
+        expected = expected.toarray()
+    np.testing.assert_allclose(compiled_preprocessor.transform(data), expected, rtol=1e-7, atol=1e-9)
+
+
+def test_matches_preprocessor_on_the_training_set(fitted, input_features):
+    assert_same_output(*fitted, input_features)
+
+
+def test_matches_preprocessor_on_schema_dtypes(fitted, schema_config, input_features):
+    # categorical columns are mapped through their codes
+    assert_same_output(*fitted, apply_schema_dtypes(input_features, schema_config))
+
+
+@pytest.mark.parametrize("row", [0, 1, 25479])
+def test_matches_preprocessor_on_a_single_row(fitted, input_features, row):
+    single_row = input_features.iloc[[row]]
+    assert_same_output(*fitted, single_row)
+    assert_same_output(*fitted, {column: [value] for column, value in single_row.iloc[0].items()})
+
+
+@pytest.mark.parametrize("column", ["continent", "education_of_employee"])
+def test_unseen_category_is_rejected_like_the_preprocessor(fitted, input_features, column):
+    preprocessor, compiled_preprocessor = fitted
+    data = input_features.iloc[:3].copy()
+    data.loc[data.index[1], column] = "Atlantis"
+    with pytest.raises(ValueError):
+        preprocessor.transform(data)
+    with pytest.raises(ValueError, match="Atlantis"):
+        compiled_preprocessor.transform(data)
+    with pytest.raises(ValueError, match="Atlantis"):
+        compiled_preprocessor.transform(apply_schema_dtypes(data, {"columns": [{column: "category"}]}))
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.neighbors import KNeighborsClassifier
+
+from us_visa.entity.fast_knn import BlockedKNeighborsClassifier
+
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = make_classification(n_samples=3000, n_features=10, n_informative=5, random_state=0)
+    # the last queries are reference samples themselves, exact matches take all the weight in distance mode
+    return X[:2000], y[:2000], np.vstack([X[2000:], X[:20]])
+
+
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+@pytest.mark.parametrize("n_rows", [1, 64, 1020])
+def test_blocked_knn_matches_kneighbors(data, weights, n_rows):
+    X_train, y_train, X_query = data
+    knn = KNeighborsClassifier(n_neighbors=5, weights=weights).fit(X_train, y_train)
+    # a small working memory splits the queries into several blocks
+    blocked_knn = BlockedKNeighborsClassifier.from_kneighbors(knn, working_memory_mb=1.0)
+    batch = X_query[-n_rows:]
+    np.testing.assert_array_equal(blocked_knn.predict(batch), knn.predict(batch))
+    np.testing.assert_allclose(blocked_knn.predict_proba(batch), knn.predict_proba(batch), rtol=1e-9, atol=1e-12)
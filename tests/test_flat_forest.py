@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from us_visa.entity.flat_forest import FlatForestClassifier, HybridForestClassifier
+
+
+@pytest.fixture(scope="module")
+def forest_and_data():
+    X, y = make_classification(n_samples=2000, n_features=12, n_informative=6, random_state=0)
+    forest = RandomForestClassifier(n_estimators=15, max_depth=12, random_state=0).fit(X, y)
+    # samples exactly on split thresholds exercise the float32 rounding of the thresholds
+    tree = forest.estimators_[0].tree_
+    splits = np.flatnonzero(tree.children_left != -1)[:50]
+    on_threshold = np.tile(X[:1], (len(splits), 1))
+    on_threshold[np.arange(len(splits)), tree.feature[splits]] = tree.threshold[splits]
+    return forest, np.vstack([X, on_threshold])
+
+
+@pytest.mark.parametrize("n_rows", [1, 7, 64, 2050])
+def test_flat_forest_matches_random_forest(forest_and_data, n_rows):
+    forest, X = forest_and_data
+    flat_forest = FlatForestClassifier.from_random_forest(forest)
+    batch = X[:n_rows]
+    np.testing.assert_array_equal(flat_forest.predict(batch), forest.predict(batch))
+    np.testing.assert_array_equal(flat_forest.predict_proba(batch), forest.predict_proba(batch))
+
+
+@pytest.mark.parametrize("n_rows", [1, 32, 33, 2050])
+def test_hybrid_forest_matches_random_forest_on_both_sides_of_the_crossover(forest_and_data, n_rows):
+    forest, X = forest_and_data
+    hybrid = HybridForestClassifier(forest, FlatForestClassifier.from_random_forest(forest), max_flat_rows=32)
+    batch = X[:n_rows]
+    expected_engine = hybrid.flat_forest if n_rows <= 32 else hybrid.forest
+    assert hybrid._select(batch) is expected_engine
+    np.testing.assert_array_equal(hybrid.predict(batch), forest.predict(batch))
+    np.testing.assert_array_equal(hybrid.predict_proba(batch), forest.predict_proba(batch))
@@ -0,0 +1,20 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from us_visa.exception import USVisaException
+from us_visa.pipeline.inference_executor import InferenceExecutor, InferenceOverloadedError
+from us_visa.pipeline.micro_batcher import PredictionBatcher
+
+
+def test_saturated_executor_reaches_the_caller_unwrapped():
+    batcher = PredictionBatcher(lambda df: [0] * len(df), executor=InferenceExecutor(max_pending=0))
+    with pytest.raises(InferenceOverloadedError):
+        asyncio.run(batcher.predict(pd.DataFrame({"a": [1]})))
+
+
+def test_other_scoring_errors_are_wrapped():
+    batcher = PredictionBatcher(lambda df: 1 / 0)
+    with pytest.raises(USVisaException):
+        asyncio.run(batcher.predict(pd.DataFrame({"a": [1]})))
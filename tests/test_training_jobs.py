@@ -0,0 +1,43 @@
+import pytest
+
+from us_visa.pipeline.training_jobs import TrainingJobManager, TrainingQueueFullError
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # two managers on the same state dir stand for two uvicorn workers; max_concurrent=0 keeps the jobs queued
+    return [TrainingJobManager(max_concurrent=0, max_queued=2, state_dir=str(tmp_path)) for _ in range(2)]
+
+
+def test_jobs_are_visible_from_every_worker(workers):
+    first, second = workers
+    job = first.submit()
+    assert second.get(job.job_id).status == "queued"
+    assert [listed.job_id for listed in second.list_jobs()] == [job.job_id]
+
+
+def test_queue_limit_holds_for_the_whole_service(workers):
+    first, second = workers
+    jobs = [first.submit(), second.submit()]
+    assert [job.job_id for job in first.list_jobs()] == [job.job_id for job in jobs]
+    with pytest.raises(TrainingQueueFullError):
+        first.submit()
+
+
+def test_job_cancelled_by_another_worker(workers):
+    first, second = workers
+    job = first.submit(full_resync=True)
+    assert second.cancel(job.job_id).status == "cancelled"
+    cancelled = first.get(job.job_id)
+    assert cancelled.status == "cancelled" and cancelled.full_resync
+    assert second.get("unknown") is None
+
+
+def test_running_job_without_heartbeat_is_failed(workers):
+    first, second = workers
+    job = first.submit()
+    with first._locked_jobs() as jobs:
+        # started by a serving process that exited since
+        jobs[job.job_id].status, jobs[job.job_id].heartbeat_at = "running", 0.0
+    failed = second.get(job.job_id)
+    assert failed.status == "failed" and "heartbeat" in failed.error
@@ -1,15 +1,17 @@
 import boto3
 from us_visa.configuration.aws_connection import S3Client
 from io import StringIO
-from typing import Union,List
+from typing import TYPE_CHECKING,Union,List
 import os,sys
-from us_visa.logger import logging
-from mypy_boto3_s3.service_resource import Bucket
+from us_visa.logger import hot_path_logging
 from us_visa.exception import USVisaException
 from botocore.exceptions import ClientError
 from pandas import DataFrame,read_csv
 import pickle
 
+if TYPE_CHECKING:
+    from mypy_boto3_s3.service_resource import Bucket
+
 class SimpleStorageService:
     def __init__(self):
         s3_client = S3Client()
@@ -39,7 +41,7 @@ class SimpleStorageService:
         Version: 1.2
         Revisions: moved setup to cloud
         """          
-        logging.info("Entered the read_object method of S3Operations class.")
+        hot_path_logging.info("Entered the read_object method of S3Operations class.")
         
         try:
             func = (
@@ -48,12 +50,12 @@ class SimpleStorageService:
                 else object_name.get()["Body"].read()
             )
             conv_func = lambda: StringIO(func()) if make_readable is True else func()
-            logging.info("Exited the read_object method od S3Operations class")
+            hot_path_logging.info("Exited the read_object method od S3Operations class")
             return conv_func()
         except Exception as e:
             raise USVisaException(e, sys) from e
     
-    def get_bucket(self, bucket_name: str) -> Bucket:
+    def get_bucket(self, bucket_name: str) -> "Bucket":
         """
         Method Name: get_bucket
         Description: This method gets the bucket object based on the bucket_name
@@ -64,11 +66,11 @@ class SimpleStorageService:
         version: 1.2
         Revisions: moved setup to cloud
         """
-        logging.info("Entered the get_bucket method od S3Operations class")
+        hot_path_logging.info("Entered the get_bucket method od S3Operations class")
         
         try:
             bucket = self.s3_resource.Bucket(bucket_name)
-            logging.info("Exited the get_bucket method of S3Operations class.")
+            hot_path_logging.info("Exited the get_bucket method of S3Operations class.")
             return bucket
         except Exception as e:
             raise USVisaException(e, sys) from e
@@ -84,7 +86,7 @@ class SimpleStorageService:
         version: 1.2
         Revisions: moved setup to cloud        
         """
-        logging.info("Entered the get_file_object method of S3Operations class")
+        hot_path_logging.info("Entered the get_file_object method of S3Operations class")
         
         try:
             bucket = self.get_bucket(bucket_name)
@@ -92,7 +94,7 @@ class SimpleStorageService:
             func = lambda x: x[0] if len(x) == 1 else x
             
             file_objs = func(file_objects)
-            logging.info("Exited the get_file_object method of S3Operations class")
+            hot_path_logging.info("Exited the get_file_object method of S3Operations class")
             
             return file_objs
         except Exception as e:
@@ -109,7 +111,7 @@ class SimpleStorageService:
         Version: 1.2
         Revisions: moved setup to cloud
         """
-        logging.info("Entered the load_model method of S3Operations class")
+        hot_path_logging.info("Entered the load_model method of S3Operations class")
         
         try:
             func = (
@@ -121,11 +123,30 @@ class SimpleStorageService:
             file_object = self.get_file_object(model_file, bucket_name)
             model_obj = self.read_object(file_object, decode = False)
             model = pickle.loads(model_obj)
-            logging.info("Exited the load_model method of S3Operations class.")
+            hot_path_logging.info("Exited the load_model method of S3Operations class.")
             return model
         except Exception as e:
             raise USVisaException(e, sys) from e
         
+    def get_object_version(self, key: str, bucket_name: str) -> str:
+        """
+        Method Name: get_object_version
+        Description: This method returns a version tag of the key object using a HEAD request only
+
+        Output: ETag and LastModified of the object joined as a single string
+        On Failure: Write an exception log and then raise an exception
+        """
+        hot_path_logging.info("Entered the get_object_version method of S3Operations class")
+
+        try:
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=key)
+            etag = response["ETag"].strip('"')
+            version = f"{etag}:{response['LastModified'].isoformat()}"
+            hot_path_logging.info("Exited the get_object_version method of S3Operations class")
+            return version
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
     def create_folder(self, folder_name:str, bucket_name: str) -> None:
         """
         Method Name: create_folder
@@ -137,7 +158,7 @@ class SimpleStorageService:
         Version: 1.2
         Revisions: moved setup to cloud
         """
-        logging.info("Entered the create_folder method of S3Operations class.")
+        hot_path_logging.info("Entered the create_folder method of S3Operations class.")
         try:
             self.s3_resource.Object(bucket_name, folder_name).load()
         except ClientError as e:
@@ -146,7 +167,7 @@ class SimpleStorageService:
                 self.s3_client.put_object(Bucket= bucket_name, key = folder_obj)
             else:
                 pass
-            logging.info("Exited the create_folder method of S3Operations class.")
+            hot_path_logging.info("Exited the create_folder method of S3Operations class.")
         
     def upload_file(self, from_filename:str, to_filename:str, bucket_name:str, remove:bool = True):
         """
@@ -159,22 +180,22 @@ class SimpleStorageService:
         Version: 1.2
         Revisions: moved setup to cloud.
         """
-        logging.info("Entered the upload_file method of S3Operations class.")
+        hot_path_logging.info("Entered the upload_file method of S3Operations class.")
         
         try:
-            logging.info(f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket.")
+            hot_path_logging.info(f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket.")
             
             self.s3_resource.meta.client.upload_file( from_filename, bucket_name, to_filename)
             
-            logging.info(f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket")
+            hot_path_logging.info(f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket")
             
             if remove is True:
                 os.remove(from_filename)      
-                logging.info(f"Remove is set to {remove}, deleted the file.")
+                hot_path_logging.info(f"Remove is set to {remove}, deleted the file.")
             else:
-                logging.info(f"Remove is set to {remove}, not deleted the file")
+                hot_path_logging.info(f"Remove is set to {remove}, not deleted the file")
                 
-            logging.info("Exited the upload_file method of S3Operations class.")
+            hot_path_logging.info("Exited the upload_file method of S3Operations class.")
         except Exception as e:
             raise USVisaException(e, sys) from e
         
@@ -189,13 +210,13 @@ class SimpleStorageService:
         Version: 1.2
         Revisions: moved setup to cloud
         """
-        logging.info("Entered the upload_df_as_csv method of S3Operations class")
+        hot_path_logging.info("Entered the upload_df_as_csv method of S3Operations class")
         
         try:
             data_frame.to_csv(local_filename, index=None, header=True)
             self.upload_file(local_filename, bucket_filename, bucket_name)
             
-            logging.info("Exited the upload_df_as_csv method of S3Operations class")
+            hot_path_logging.info("Exited the upload_df_as_csv method of S3Operations class")
         except Exception as e:
             raise USVisaException(e, sys) from e
         
@@ -214,7 +235,7 @@ class SimpleStorageService:
         try:
             content = self.read_object(object_, make_readable=True)
             df = read_csv(content, na_values= "na")
-            logging.info("Exited the get_df_from_object method of S3Operations class")
+            hot_path_logging.info("Exited the get_df_from_object method of S3Operations class")
             return df
         except Exception as e:
             raise USVisaException(e, sys) from e
@@ -230,12 +251,12 @@ class SimpleStorageService:
         Version:1.2
         Revisions: moved setup to cloud
         """
-        logging.info("Entered the read_csv method of S3Operations class")
+        hot_path_logging.info("Entered the read_csv method of S3Operations class")
         
         try:
             csv_obj = self.get_file_object(filename, bucket_name)
             df = self.get_df_from_object(csv_obj)
-            logging.info("Exited the read_csv method of S3Operations class")
+            hot_path_logging.info("Exited the read_csv method of S3Operations class")
             return df
         except Exception as e:
             raise USVisaException(e, sys) from e
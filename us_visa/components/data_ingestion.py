@@ -1,26 +1,176 @@
+import fcntl
 import os
 import sys
+from datetime import datetime
+from typing import List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
+from bson import ObjectId
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 
+from us_visa.constants import SCHEMA_FILE_PATH
 from us_visa.entity.config_entity import DataIngestionConfig
 from us_visa.entity.artifact_entity import DataInjectionArtifact
 from us_visa.exception import USVisaException
 from us_visa.logger import logging
 from us_visa.data_access.usvisa_data import USVisaData
+from us_visa.utils.artifact_writer import ArtifactWriter
+from us_visa.utils.main_utils import (apply_schema_dtypes, get_schema_read_dtypes, read_yaml_file, save_dataframe,
+                                     write_yaml_file)
 
 class DataIngestion:
-    def __init__(self,data_ingestion_config:DataIngestionConfig = DataIngestionConfig()):
+    def __init__(self,data_ingestion_config:DataIngestionConfig = DataIngestionConfig(),
+                 artifact_writer: Optional[ArtifactWriter] = None):
         """
         :param data_ingestion_config: configuration for data ingestion
+        :param artifact_writer: Writer of the artifact files, files are written inline when None
         """
         
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.artifact_writer = artifact_writer if artifact_writer is not None else ArtifactWriter(background=False)
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         except Exception as e:
             raise USVisaException(e, sys)
         
+    @staticmethod
+    def get_schema_columns() -> List[str]:
+        """
+        Column names of schema.yaml, in schema order
+        """
+        return [column for entry in read_yaml_file(SCHEMA_FILE_PATH)["columns"] for column in entry]
+
+    def read_ingestion_state(self) -> Optional[dict]:
+        """
+        State of the persistent feature store written by the last sync, None when there is no usable store
+        """
+        state_file_path = self.data_ingestion_config.state_file_path
+        if not (os.path.exists(state_file_path) and os.path.exists(self.data_ingestion_config.store_file_path)):
+            return None
+        return read_yaml_file(state_file_path)
+
+    def sync_feature_store(self) -> int:
+        """
+        Method Name : sync_feature_store
+        Description : This method brings the persistent feature store (shared by all runs) up to date with
+                      mongodb. Only documents with an _id above the watermark of the last sync are read; a new
+                      document replaces the stored record with the same key_column (case_id), and between new
+                      documents with the same key the last one inserted wins. full_resync, or a missing store
+                      or state file, rebuilds the store from the whole collection.
+        
+        Output : number of documents read from mongodb
+        On Failure : Write an exception log and then raise an exception
+        """
+        
+        try:
+            config = self.data_ingestion_config
+            os.makedirs(config.store_dir, exist_ok=True)
+            with open(os.path.join(config.store_dir, ".lock"), "w") as lock_file:
+                # concurrent training jobs share the store
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                
+                state = None if config.full_resync else self.read_ingestion_state()
+                after_id = None if state is None or state["last_id"] is None else ObjectId(state["last_id"])
+                logging.info(f"Syncing feature store {config.store_file_path} "
+                             + ("from the whole collection" if after_id is None else f"from documents after {after_id}"))
+                
+                delta_file_path = f"{config.store_file_path}.delta"
+                n_read = USVisaData().export_collection_to_csv(config.collection_name, delta_file_path,
+                                                               self.get_schema_columns(), config.export_batch_size,
+                                                               n_partitions=config.export_parallelism,
+                                                               after_id=after_id, with_id=True)
+                if state is not None and not n_read:
+                    os.remove(delta_file_path)
+                    logging.info("Feature store is up to date")
+                    return 0
+                
+                # the delta is in _id order, the last document of every key wins
+                delta_index = pd.read_csv(delta_file_path, usecols=[config.key_column, "_id"], dtype=str,
+                                          keep_default_na=False)
+                last_id = ObjectId(delta_index["_id"].iloc[-1]) if n_read else after_id
+                keep_new = ~delta_index[config.key_column].duplicated(keep="last").to_numpy()
+                stored_keys = pd.Series([], dtype=object) if state is None else \
+                    pd.read_csv(config.store_file_path, usecols=[config.key_column], dtype=str,
+                                keep_default_na=False)[config.key_column]
+                replaced = stored_keys.isin(set(delta_index[config.key_column])).to_numpy()
+                self._merge_into_feature_store(delta_file_path, replaced, keep_new, state is not None)
+                
+                n_records = int(len(stored_keys) - replaced.sum() + keep_new.sum())
+                write_yaml_file(config.state_file_path, {"last_id": str(last_id) if last_id is not None else None,
+                                                         "n_records": n_records,
+                                                         "updated_at": datetime.now().isoformat()})
+                logging.info(f"Read {n_read} documents, replaced {int(replaced.sum())} stored records, "
+                             f"feature store holds {n_records} records")
+                return n_read
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def _merge_into_feature_store(self, delta_file_path: str, replaced: np.ndarray, keep_new: np.ndarray,
+                                  keep_stored: bool) -> None:
+        """
+        Adds the kept records of the delta file (without its _id column) to the feature store, chunk by chunk.
+        They are appended when no stored record is replaced, otherwise the store is rewritten with the
+        stored records not replaced followed by the kept new ones. Values are copied as text so the
+        records that stay are written back unchanged.
+        """
+        config = self.data_ingestion_config
+        read_options = dict(chunksize=config.export_batch_size, dtype=str, keep_default_na=False)
+        appending = keep_stored and not replaced.any()
+        sources = [(delta_file_path, keep_new)]
+        if keep_stored and not appending:
+            sources.insert(0, (config.store_file_path, ~replaced))
+        target_file_path = config.store_file_path if appending else f"{config.store_file_path}.part"
+        
+        with open(target_file_path, "a" if appending else "w", newline="") as store_file:
+            header = not appending
+            for file_path, keep in sources:
+                position = 0
+                for chunk in pd.read_csv(file_path, **read_options):
+                    keep_chunk = keep[position:position + len(chunk)]
+                    position += len(chunk)
+                    chunk[keep_chunk].drop(columns=["_id"], errors="ignore").to_csv(store_file, index=False,
+                                                                                    header=header)
+                    header = False
+            if header:
+                store_file.write(",".join(self.get_schema_columns()) + "\n")
+        if not appending:
+            os.replace(target_file_path, config.store_file_path)
+        os.remove(delta_file_path)
+
+    def read_export_file(self, file_path: str) -> DataFrame:
+        """
+        Method Name : read_export_file
+        Description : This method reads an exported csv file back into a DataFrame. With schema_dtypes the
+                      file is parsed export_batch_size rows at a time and every chunk is cast to the
+                      schema.yaml dtypes before the next one is parsed, so the untyped text of only one chunk
+                      is held next to the typed frame. The categories of every column are the union over
+                      all chunks.
+
+        Output : DataFrame of the file
+        On Failure : Write an exception log and then raise an exception
+        """
+        try:
+            if not self.data_ingestion_config.schema_dtypes:
+                return pd.read_csv(file_path)
+            chunks = [apply_schema_dtypes(chunk, self._schema_config)
+                      for chunk in pd.read_csv(file_path, dtype=get_schema_read_dtypes(self._schema_config),
+                                               chunksize=self.data_ingestion_config.export_batch_size)]
+            for column in chunks[0].columns:
+                if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+                    categories = chunks[0][column].cat.categories
+                    for chunk in chunks[1:]:
+                        categories = categories.union(chunk[column].cat.categories)
+                    for chunk in chunks:
+                        chunk[column] = chunk[column].cat.set_categories(categories)
+            dataframe = pd.concat(chunks, ignore_index=True)
+            del chunks
+            # int columns are downcast per chunk, the whole column is cast once more to a single dtype
+            return apply_schema_dtypes(dataframe, self._schema_config)
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
     def export_data_into_feature_store(self) -> DataFrame:
         """
         Method Name : export_data_into_feature_store
@@ -33,24 +183,43 @@ class DataIngestion:
         try:
             logging.info(f"Exporting data from mongodb")
             usvisa_data = USVisaData()
-            dataframe = usvisa_data.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name)
-            
-            logging.info(f"Shape of datafrmae: {dataframe.shape}")
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
             dir_path = os.path.dirname(feature_store_file_path)
             os.makedirs(dir_path,exist_ok=True)
+            
+            schema_dtypes = self.data_ingestion_config.schema_dtypes
+            if self.data_ingestion_config.incremental:
+                self.sync_feature_store()
+                dataframe = self.read_export_file(self.data_ingestion_config.store_file_path)
+            elif self.data_ingestion_config.streaming_export:
+                raw_export_file_path = self.data_ingestion_config.raw_export_file_path
+                logging.info(f"Streaming data into raw export file path: {raw_export_file_path} "
+                             f"in batches of {self.data_ingestion_config.export_batch_size} records")
+                usvisa_data.export_collection_to_csv(collection_name=self.data_ingestion_config.collection_name,
+                                                     file_path=raw_export_file_path,
+                                                     columns=self.get_schema_columns(),
+                                                     batch_size=self.data_ingestion_config.export_batch_size,
+                                                     n_partitions=self.data_ingestion_config.export_parallelism)
+                dataframe = self.read_export_file(raw_export_file_path)
+            else:
+                dataframe = usvisa_data.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name)
+                # the only text parse of the run, later stages read the typed files
+                if schema_dtypes:
+                    dataframe = apply_schema_dtypes(dataframe, self._schema_config)
+            logging.info(f"Shape of datafrmae: {dataframe.shape}")
             logging.info(f"Saving exported data into feature store file path: {feature_store_file_path}")
-            dataframe.to_csv(feature_store_file_path,index=False,header=True)
+            self.artifact_writer.submit(save_dataframe, feature_store_file_path, dataframe,
+                                        compression=self.data_ingestion_config.compression)
             return dataframe
         except Exception as e:
             raise USVisaException(e, sys)
     
-    def split_data_as_train_test(self, dataframe:DataFrame) -> None:
+    def split_data_as_train_test(self, dataframe:DataFrame) -> Tuple[DataFrame, DataFrame]:
         """
         Method Name: split_data_as_train_test
         Description: This method will split data into train and test datasets based on split ratio
         
-        output : Folder is created in s3 bucket
+        output : train set and test set, their files are written by the artifact writer
         On Failure: Write an exception log and then raise an exception
         """
         
@@ -65,10 +234,13 @@ class DataIngestion:
             os.makedirs(dir_path,exist_ok=True)
             
             logging.info(f"Exporting train and test file path.")
-            train_set.to_csv(self.data_ingestion_config.training_file_path,index=False,header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path,index=False,header=True)
+            self.artifact_writer.submit(save_dataframe, self.data_ingestion_config.training_file_path, train_set,
+                                        compression=self.data_ingestion_config.compression)
+            self.artifact_writer.submit(save_dataframe, self.data_ingestion_config.testing_file_path, test_set,
+                                        compression=self.data_ingestion_config.compression)
             
             logging.info(f"Exported train and test path.")
+            return train_set, test_set
         except Exception as e:
             raise USVisaException(e, sys) from e
         
@@ -87,13 +259,15 @@ class DataIngestion:
             dataframe = self.export_data_into_feature_store()
             logging.info(f"Got the data from mongodb")
             
-            self.split_data_as_train_test(dataframe)
+            train_set, test_set = self.split_data_as_train_test(dataframe)
             logging.info(f"Performed train_test_split on the dataset.")
             
             logging.info(f"Exited initiate_data_ingestion method of Data_ingestion class.")
             
             data_ingestion_artifact = DataInjectionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
                                                             test_file_path = self.data_ingestion_config.testing_file_path)
+            if self.artifact_writer.background:
+                data_ingestion_artifact.train_df, data_ingestion_artifact.test_df = train_set, test_set
             
             logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
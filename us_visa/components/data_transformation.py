@@ -1,4 +1,5 @@
 import sys
+from typing import Optional
 
 import numpy as np
 import pandas as pd
@@ -12,31 +13,36 @@ from us_visa.entity.config_entity import DataTransformationConfig
 from us_visa.entity.artifact_entity import DataTransformationArtifact,DataInjectionArtifact, DataValidationArtifact
 from us_visa.exception import USVisaException
 from us_visa.logger import logging
-from us_visa.utils.main_utils import save_object, save_numpy_array_data,read_yaml_file,drop_columns
+from us_visa.utils.main_utils import save_object, save_numpy_array_data,read_yaml_file,drop_columns,load_dataframe
 from us_visa.entity.estimator import TargetValueMapping
+from us_visa.entity.compiled_preprocessor import CompiledPreprocessor
+from us_visa.utils.artifact_writer import ArtifactWriter
 
 class DataTransformation:
     def __init__(self, data_ingestion_artifact:DataInjectionArtifact,
                        data_transformation_config:DataTransformationConfig,
-                       data_validation_artifact:DataValidationArtifact):
+                       data_validation_artifact:DataValidationArtifact,
+                       artifact_writer: Optional[ArtifactWriter] = None):
         
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_transformation_config: Configuration for data transformation
         :param data_validation_artifact: Output reference of data validation artifact stage
+        :param artifact_writer: Writer of the artifact files, files are written inline when None
         """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_transformation_config = data_transformation_config
             self.data_validation_artifact = data_validation_artifact
+            self.artifact_writer = artifact_writer if artifact_writer is not None else ArtifactWriter(background=False)
             self._schema_config = read_yaml_file(file_path = SCHEMA_FILE_PATH)
         except Exception as e:
             raise USVisaException(e, sys) from e
         
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(file_path, schema_config: Optional[dict] = None) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return load_dataframe(file_path, schema_config=schema_config)
         except Exception as e:
             raise USVisaException(e, sys) from e
         
@@ -85,6 +91,29 @@ class DataTransformation:
         except Exception as e:
             raise USVisaException(e, sys) from e
         
+    def export_compiled_preprocessor(self, preprocessor: ColumnTransformer, input_feature_df: pd.DataFrame,
+                                     transformed_arr: np.ndarray) -> Optional[CompiledPreprocessor]:
+        """
+        Method Name: export_compiled_preprocessor
+        Description: This method exports the fitted preprocessor into its NumPy only representation
+                     and keeps it only if it reproduces the sklearn output on input_feature_df
+        
+        Output:  the compiled preprocessor, saved at compiled_object_file_path, None when it can not be used
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            compiled_preprocessor = CompiledPreprocessor.from_column_transformer(preprocessor)
+            if not compiled_preprocessor.check_parity(transformed_arr, input_feature_df):
+                logging.info(f"Compiled preprocessor output differs from the preprocessor, not exported.")
+                return None
+            self.artifact_writer.submit(save_object, self.data_transformation_config.compiled_object_file_path,
+                                        compiled_preprocessor)
+            logging.info(f"Saved the compiled preprocessor object.")
+            return compiled_preprocessor
+        except Exception as e:
+            logging.info(f"Preprocessor could not be compiled: {e}")
+            return None
+        
     def initiate_data_transformation(self,) -> DataTransformationArtifact:
         """
         Method Name: initiate_data_transformation
@@ -99,8 +128,12 @@ class DataTransformation:
                 preprocessor = self.get_data_transformer_object()
                 logging.info(f"Got the preprocessor object.")
                 
-                train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-                test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.test_file_path)
+                train_df, test_df = self.data_ingestion_artifact.train_df, self.data_ingestion_artifact.test_df
+                if train_df is None or test_df is None:
+                    train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.trained_file_path,
+                                                            schema_config=self._schema_config)
+                    test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.test_file_path,
+                                                           schema_config=self._schema_config)
                 
                 input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN],axis= 1)
                 target_feature_train_df = train_df[TARGET_COLUMN]
@@ -172,19 +205,32 @@ class DataTransformation:
                 
                 test_arr = np.c_[input_feature_test_final, np.array(target_feature_test_final)]
                 
-                save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-                save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
-                save_numpy_array_data(self.data_transformation_config.transformed_test_file_path,array=test_arr)
+                self.artifact_writer.submit(save_object, self.data_transformation_config.transformed_object_file_path,
+                                            preprocessor)
+                self.artifact_writer.submit(save_numpy_array_data,
+                                            self.data_transformation_config.transformed_train_file_path, array=train_arr)
+                self.artifact_writer.submit(save_numpy_array_data,
+                                            self.data_transformation_config.transformed_test_file_path, array=test_arr)
 
                 logging.info(f"Saved the preprocessor object.")
                 
+                compiled_preprocessor = self.export_compiled_preprocessor(preprocessor, input_feature_test_df,
+                                                                          input_feature_test_arr)
+                
                 logging.info(f"Exited initiate_data_transformation method of Data_transformation class.")
                 
                 data_transformation_artifact = DataTransformationArtifact(
                     transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
                     transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                    transformed_test_file_path=self.data_transformation_config.transformed_test_file_path
-                )                
+                    transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                    compiled_object_file_path=(None if compiled_preprocessor is None
+                                               else self.data_transformation_config.compiled_object_file_path)
+                )
+                if self.artifact_writer.background:
+                    data_transformation_artifact.train_arr = train_arr
+                    data_transformation_artifact.test_arr = test_arr
+                    data_transformation_artifact.preprocessing_object = preprocessor
+                    data_transformation_artifact.compiled_preprocessing_object = compiled_preprocessor
                 return data_transformation_artifact
             else:
                 raise Exception(self.data_validation_artifact.message)
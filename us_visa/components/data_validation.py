@@ -1,14 +1,20 @@
 import json
+import os
 import sys
+import time
+from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd 
 from evidently.model_profile import Profile
 from evidently.model_profile.sections import DataDriftProfileSection
 
 from pandas import DataFrame
+from scipy.stats import chi2_contingency
+from us_visa.data_access.usvisa_data import USVisaData
 from us_visa.exception import USVisaException
 from us_visa.logger import logging
-from us_visa.utils.main_utils import read_yaml_file,write_yaml_file
+from us_visa.utils.main_utils import load_dataframe,read_yaml_file,write_yaml_file
 from us_visa.entity.artifact_entity import DataInjectionArtifact,DataValidationArtifact
 from us_visa.entity.config_entity import DataValidationConfig
 from us_visa.constants import SCHEMA_FILE_PATH
@@ -92,9 +98,9 @@ class DataValidation:
         
     
     @staticmethod
-    def read_data(file_path) -> DataFrame:
+    def read_data(file_path, schema_config: Optional[dict] = None) -> DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return load_dataframe(file_path, schema_config=schema_config)
         except Exception as e:        
             raise USVisaException(e,sys)
         
@@ -112,6 +118,12 @@ class DataValidation:
         # logging.info(f"current dataframe [{current_df}]")
         
         try:
+            # string columns of schema.yaml are unique keys (case_id): every value is a category of its own, so
+            # they always drift and their contingency tables grow with the square of the rows
+            key_columns = [column for entry in self._schema_config["columns"]
+                           for column, dtype in entry.items() if dtype == "string"]
+            reference_df = reference_df.drop(columns=key_columns, errors="ignore")
+            current_df = current_df.drop(columns=key_columns, errors="ignore")
             data_drift_profile = Profile(sections=[DataDriftProfileSection()])
             data_drift_profile.calculate(reference_df, current_df)
             
@@ -129,6 +141,143 @@ class DataValidation:
         except Exception as e:
             raise USVisaException(e,sys) from e
                 
+    def validate_profile(self, profile: dict) -> str:
+        """
+        Method Name: validate_profile
+        Description: This method validates a collection profile against the schema: every schema column
+                     must have values and numerical columns must only hold numbers
+        
+        Output: Returns the validation error message, empty when the profile is valid
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            validation_error_msg = ""
+            missing_columns = [column for column, nulls in profile["nulls"].items()
+                               if profile["count"] == 0 or nulls == profile["count"]]
+            if missing_columns:
+                logging.info(f"Missing columns: {missing_columns}")
+                validation_error_msg += f"Columns are missing in collection: {missing_columns}."
+            
+            non_numeric_columns = [column for column, numerical in profile["numerical"].items()
+                                   if numerical["count"] + profile["nulls"][column] < profile["count"]]
+            if non_numeric_columns:
+                logging.info(f"Non numeric values in numerical columns: {non_numeric_columns}")
+                validation_error_msg += f"Non numeric values in numerical columns: {non_numeric_columns}."
+            return validation_error_msg
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+    
+    @staticmethod
+    def _chi_square_p_value(reference_counts: list, current_counts: list) -> float:
+        """
+        p value of a chi-square test that both count vectors (over the same bins) come from the same distribution
+        """
+        table = np.array([reference_counts, current_counts], dtype=float)
+        table = table[:, table.sum(axis=0) > 0]
+        if table.shape[1] < 2 or (table.sum(axis=1) == 0).any():
+            return 1.0
+        return float(chi2_contingency(table)[1])
+    
+    def detect_profile_drift(self, reference_profile: dict, current_profile: dict) -> bool:
+        """
+        Method Name: detect_profile_drift
+        Description: This method detects drift between two collection profiles with a chi-square test per
+                     column, on the category frequencies of categorical columns and on the histograms (same
+                     boundaries, plus the values out of range) of numerical columns
+        
+        Output: Returns bool value based on drift detection results
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            features = {}
+            truncated = set(reference_profile["truncated_categorical"]) | set(current_profile["truncated_categorical"])
+            for column, reference in reference_profile["categorical"].items():
+                if column in truncated:
+                    continue
+                current = current_profile["categorical"].get(column, {})
+                categories = sorted(set(reference) | set(current))
+                features[column] = self._chi_square_p_value([reference.get(category, 0) for category in categories],
+                                                            [current.get(category, 0) for category in categories])
+            for column, reference in reference_profile["numerical"].items():
+                current = current_profile["numerical"].get(column)
+                if current is None or current["boundaries"] != reference["boundaries"]:
+                    features[column] = 0.0 if reference["count"] else 1.0
+                    continue
+                features[column] = self._chi_square_p_value(reference["histogram"] + [reference["out_of_range"]],
+                                                            current["histogram"] + [current["out_of_range"]])
+            
+            drifted = {column: p_value < self.data_validation_config.drift_p_value
+                       for column, p_value in features.items()}
+            n_drifted_features = sum(drifted.values())
+            drift_status = bool(features) and \
+                n_drifted_features / len(features) >= self.data_validation_config.drift_share
+            report = {"data_drift": {"data": {
+                "metrics": {"n_features": len(features), "n_drifted_features": n_drifted_features,
+                            "dataset_drift": drift_status},
+                "features": {column: {"p_value": p_value, "drift_detected": drifted[column]}
+                             for column, p_value in features.items()},
+            }}}
+            write_yaml_file(file_path=self.data_validation_config.drift_report_file_path, content=report)
+            logging.info(f"{n_drifted_features}/{len(features)} drift detected.")
+            return drift_status
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+    
+    def profile_collection(self, reference_profile: Optional[dict] = None) -> dict:
+        """
+        Profiles the collection server side, with the histogram boundaries of reference_profile when given
+        """
+        boundaries = None if reference_profile is None else \
+            {column: numerical["boundaries"] for column, numerical in reference_profile["numerical"].items()}
+        start = time.perf_counter()
+        profile = USVisaData().profile_collection(self.data_validation_config.collection_name,
+                                                  columns=[column for entry in self._schema_config["columns"]
+                                                           for column in entry],
+                                                  categorical_columns=self._schema_config["categorical_columns"],
+                                                  numerical_columns=self._schema_config["numerical_columns"],
+                                                  n_buckets=self.data_validation_config.histogram_buckets,
+                                                  max_categories=self.data_validation_config.max_categories,
+                                                  boundaries=boundaries)
+        logging.info(f"Profiled {profile['count']} documents in {time.perf_counter() - start:.3f} s")
+        return profile
+    
+    def validate_collection_profile(self) -> Tuple[bool, str]:
+        """
+        Method Name: validate_collection_profile
+        Description: This method validates the collection from its server side profile and checks drift
+                     against the profile of the previous run (the reference), the current profile then
+                     becomes the reference
+        
+        Output: Returns validation status and message
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_validation_config
+            reference_profile = read_yaml_file(config.reference_profile_file_path) \
+                if os.path.exists(config.reference_profile_file_path) else None
+            profile = self.profile_collection(reference_profile)
+            write_yaml_file(config.profile_file_path, profile)
+            
+            validation_error_msg = self.validate_profile(profile)
+            validation_status = len(validation_error_msg) == 0
+            if not validation_status:
+                logging.info(f"Validation_error: {validation_error_msg}")
+                return validation_status, validation_error_msg
+            
+            if reference_profile is None:
+                write_yaml_file(config.drift_report_file_path, {"data_drift": None})
+                validation_error_msg = "No reference profile, drift not checked"
+            elif self.detect_profile_drift(reference_profile, profile):
+                logging.info(f"Drift detected.")
+                validation_error_msg = "Drift detected"
+            else:
+                validation_error_msg = "Drift not detected"
+            # histograms of the next run use the boundaries of this profile
+            write_yaml_file(config.reference_profile_file_path, profile)
+            return validation_status, validation_error_msg
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+    
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
         Method Name: initiate_data_validation
@@ -142,8 +291,22 @@ class DataValidation:
         try:
             validation_error_msg = ""
             logging.info("Starting data validation")
-            train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                 DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+            if self.data_validation_config.server_side_profiling:
+                validation_status, validation_error_msg = self.validate_collection_profile()
+                data_validation_artifact = DataValidationArtifact(
+                    validation_status=validation_status,
+                    message=validation_error_msg,
+                    drift_report_file_path=self.data_validation_config.drift_report_file_path
+                )
+                logging.info(f"Data validation artifact: {data_validation_artifact}")
+                return data_validation_artifact
+            
+            train_df, test_df = self.data_ingestion_artifact.train_df, self.data_ingestion_artifact.test_df
+            if train_df is None or test_df is None:
+                train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path,
+                                                              schema_config=self._schema_config),
+                                     DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path,
+                                                              schema_config=self._schema_config))
             # logging.info(train_df)
             # logging.info(test_df)
             # print(train_df)self.data_ingestion_config.training_file_path
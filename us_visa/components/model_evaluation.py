@@ -11,6 +11,7 @@ from us_visa.entity.s3_estimator import USVisaEstimator
 from dataclasses import dataclass
 from us_visa.entity.estimator import USVisaModel
 from us_visa.entity.estimator import TargetValueMapping
+from us_visa.utils.main_utils import load_dataframe
 
 
 @dataclass
@@ -61,7 +62,9 @@ class ModelEvaluation:
         On Failure: Write an exception log and then raise an exception
         """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            test_df = self.data_ingestion_artifact.test_df
+            # the live test set is shared with the artifact writer, add company_age to a copy
+            test_df = load_dataframe(self.data_ingestion_artifact.test_file_path) if test_df is None else test_df.copy()
             test_df['company_age'] = CURRENT_YEAR - test_df['yr_of_estab']
             
             x,y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
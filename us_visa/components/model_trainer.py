@@ -1,32 +1,43 @@
+import pickle
 import sys
-from typing import Tuple
+import time
+from functools import partial
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import accuracy_score,f1_score,precision_score, recall_score
 from neuro_mf import ModelFactory
 
 from us_visa.exception import USVisaException
 from us_visa.logger import logging
 from us_visa.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object
+from us_visa.utils.artifact_writer import ArtifactWriter
 from us_visa.entity.config_entity import ModelTrainerConfig
-from us_visa.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from us_visa.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact, ForestExportArtifact, KNNReductionArtifact
 from us_visa.entity.estimator import USVisaModel
+from us_visa.entity.fast_knn import BlockedKNeighborsClassifier, reduce_prototypes
+from us_visa.entity.flat_forest import FlatForestClassifier, HybridForestClassifier
 
 
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                         model_trainer_config: ModelTrainerConfig):
+                         model_trainer_config: ModelTrainerConfig,
+                         artifact_writer: Optional[ArtifactWriter] = None):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage.
         :param data_transformation_artifact: Configuration for data transformation.
+        :param artifact_writer: Writer of the artifact files, files are written inline when None
         """
         
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.artifact_writer = artifact_writer if artifact_writer is not None else ArtifactWriter(background=False)
         
     def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
         """
@@ -49,18 +60,125 @@ class ModelTrainer:
             )
             model_obj = best_model_detail.best_model
             
+            metric_artifact = self.get_metric_artifact(model_obj, x_test=x_test, y_test=y_test)
+        
+            return best_model_detail, metric_artifact
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    @staticmethod
+    def get_metric_artifact(model_obj: object, x_test: np.ndarray, y_test: np.ndarray) -> ClassificationMetricArtifact:
+        """
+        Method Name: get_metric_artifact
+        Description: This method scores model_obj on the test set
+        
+        Output: Returns the f1, precision and recall of the test predictions
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
             y_pred = model_obj.predict(x_test)
             
-            accuracy = accuracy_score(y_test, y_pred)
             f1= f1_score(y_test, y_pred)
             precision = precision_score(y_test,y_pred)
             recall = recall_score(y_test, y_pred)
-            metric_artifact = ClassificationMetricArtifact(f1_score=f1,precision_score=precision,recall_score=recall)
-        
-            return best_model_detail, metric_artifact
+            return ClassificationMetricArtifact(f1_score=f1,precision_score=precision,recall_score=recall)
         except Exception as e:
             raise USVisaException(e, sys) from e
 
+    def export_flat_forest(self, model_obj: object, x_test: np.ndarray) -> Tuple[object, Optional[ForestExportArtifact]]:
+        """
+        Method Name: export_flat_forest
+        Description: This method exports a RandomForestClassifier into its flattened array representation
+                     when both give identical predictions and probabilities on x_test. With
+                     flat_forest_max_rows the flat forest scores batches of up to that many rows and the
+                     sklearn forest, kept next to it, the larger ones: the pickled model is then larger than
+                     the sklearn forest alone. Without it only the flat forest is kept, the smallest model,
+                     slower than sklearn on large batches.
+        
+        Output: Returns the model object used for scoring and the engine chosen with the pickled sizes
+        On Failure: Write an exception log and then keep the sklearn model
+        """
+        if not isinstance(model_obj, RandomForestClassifier):
+            return model_obj, None
+        try:
+            flat_forest = FlatForestClassifier.from_random_forest(model_obj)
+            max_flat_rows = self.model_trainer_config.flat_forest_max_rows
+            if not flat_forest.check_parity(model_obj, x_test):
+                logging.info("Flattened forest predictions differ from the forest, keeping the sklearn model.")
+                selected = model_obj
+            elif max_flat_rows is None:
+                logging.info("Using the flattened forest for every batch.")
+                selected = flat_forest
+            else:
+                logging.info(f"Using the flattened forest for batches of up to {max_flat_rows} rows.")
+                selected = HybridForestClassifier(model_obj, flat_forest, max_flat_rows=max_flat_rows)
+
+            forest_export_artifact = ForestExportArtifact(
+                engine=type(selected).__name__,
+                max_flat_rows=max_flat_rows if isinstance(selected, HybridForestClassifier) else None,
+                model_size_bytes_before=len(pickle.dumps(model_obj)),
+                model_size_bytes_flat=len(pickle.dumps(flat_forest)),
+                model_size_bytes_after=len(pickle.dumps(selected)),
+            )
+            logging.info(f"Forest export artifact: {forest_export_artifact}")
+            return selected, forest_export_artifact
+        except Exception as e:
+            logging.info(f"Forest could not be flattened: {e}")
+            return model_obj, None
+
+    def reduce_knn_prototypes(self, model_obj: object, x_test: np.ndarray,
+                              y_test: np.ndarray) -> Tuple[object, Optional[KNNReductionArtifact]]:
+        """
+        Method Name: reduce_knn_prototypes
+        Description: This method moves a KNeighborsClassifier onto the blocked matrix multiplication search.
+                     Candidates are tried from the smallest: the reference set shrunk by edited and condensed
+                     nearest neighbour selection, by edited selection only (both when knn_prototype_reduction)
+                     and the full reference set. The first whose test f1 stays within knn_max_f1_drop and
+                     whose test latency is not worse replaces the model.
+        
+        Output: Returns the model object used for scoring and the before/after report
+        On Failure: Write an exception log and then keep the sklearn model
+        """
+        if not isinstance(model_obj, KNeighborsClassifier):
+            return model_obj, None
+        try:
+            def evaluate(model) -> Tuple[float, float]:
+                start = time.perf_counter()
+                y_pred = model.predict(x_test)
+                return f1_score(y_test, y_pred), time.perf_counter() - start
+
+            f1_before, latency_before = evaluate(model_obj)
+            selected, f1_after, latency_after = model_obj, f1_before, latency_before
+            condense_options = (True, False) if self.model_trainer_config.knn_prototype_reduction else ()
+            candidates = [partial(reduce_prototypes, model_obj, condense=condense) for condense in condense_options]
+            candidates.append(partial(BlockedKNeighborsClassifier.from_kneighbors, model_obj))
+            for make_candidate in candidates:
+                candidate = make_candidate()
+                candidate_f1, candidate_latency = evaluate(candidate)
+                logging.info(f"KNN candidate {candidate}: f1 {candidate_f1}, test latency {candidate_latency}s")
+                if candidate_f1 >= f1_before - self.model_trainer_config.knn_max_f1_drop \
+                        and candidate_latency <= latency_before:
+                    selected, f1_after, latency_after = candidate, candidate_f1, candidate_latency
+                    break
+
+            knn_reduction_artifact = KNNReductionArtifact(
+                engine=type(selected).__name__,
+                is_reduced=selected is not model_obj and len(selected.prototypes) < len(model_obj._fit_X),
+                n_prototypes_before=len(model_obj._fit_X),
+                n_prototypes_after=len(selected.prototypes) if selected is not model_obj else len(model_obj._fit_X),
+                model_size_bytes_before=len(pickle.dumps(model_obj)),
+                model_size_bytes_after=len(pickle.dumps(selected)),
+                test_latency_seconds_before=latency_before,
+                test_latency_seconds_after=latency_after,
+                f1_score_before=f1_before,
+                f1_score_after=f1_after,
+            )
+            logging.info(f"KNN reduction artifact: {knn_reduction_artifact}")
+            return selected, knn_reduction_artifact
+        except Exception as e:
+            logging.info(f"KNN prototypes could not be reduced: {e}")
+            return model_obj, None
+
     def initiate_model_trainer(self, ) -> ModelTrainerArtifact:
         logging.info("Entered initiate_model_trainer method of ModelTrainer class.")
         """
@@ -71,27 +189,48 @@ class ModelTrainer:
         On Failure: Write an exception log and then raise an exception
         """        
         try:
-            train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
+            train_arr, test_arr = self.data_transformation_artifact.train_arr, self.data_transformation_artifact.test_arr
+            if train_arr is None or test_arr is None:
+                train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
+                test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
             
             best_model_detail, metric_artifact = self.get_model_object_and_report(train = train_arr, test = test_arr)
             
-            preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            preprocessing_obj = self.data_transformation_artifact.preprocessing_object
+            if preprocessing_obj is None:
+                preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
+            
+            compiled_preprocessing_obj = self.data_transformation_artifact.compiled_preprocessing_object
+            if compiled_preprocessing_obj is None and self.data_transformation_artifact.compiled_object_file_path is not None:
+                compiled_preprocessing_obj = load_object(file_path=self.data_transformation_artifact.compiled_object_file_path)
             
             if best_model_detail.best_score < self.model_trainer_config.expected_accuracy:
                 logging.info("No best model found with score more than base score.")
                 raise Exception("No best model found with score more than base score.")
             
+            trained_model_obj, forest_export_artifact = self.export_flat_forest(best_model_detail.best_model,
+                                                                                x_test=test_arr[:, :-1])
+            trained_model_obj, knn_reduction_artifact = self.reduce_knn_prototypes(
+                trained_model_obj, x_test=test_arr[:, :-1], y_test=test_arr[:, -1])
+            if trained_model_obj is not best_model_detail.best_model:
+                # model evaluation accepts the model on these scores, they must be the ones of the model shipped
+                metric_artifact = self.get_metric_artifact(trained_model_obj, x_test=test_arr[:, :-1],
+                                                           y_test=test_arr[:, -1])
+                logging.info(f"Metrics of the exported model: {metric_artifact}")
+            
             usvisa_model = USVisaModel(preprocessing_object = preprocessing_obj,
-                                       trained_model_object=best_model_detail.best_model)
+                                       trained_model_object=trained_model_obj,
+                                       compiled_preprocessing_object=compiled_preprocessing_obj)
             
             logging.info("Created usvisa model object with preprocessor and model.")
             logging.info("Created best model file path.")
-            save_object(self.model_trainer_config.trained_model_file_path, usvisa_model)
+            self.artifact_writer.submit(save_object, self.model_trainer_config.trained_model_file_path, usvisa_model)
             
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                 metric_artifact = metric_artifact,
+                forest_export_artifact = forest_export_artifact,
+                knn_reduction_artifact = knn_reduction_artifact,
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
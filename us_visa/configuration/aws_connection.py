@@ -1,6 +1,6 @@
 import boto3
 import os
-from us_visa.constants import AWS_ACCESS_KEY_ID_ENV_KEY,AWS_SECRET_ACCESS_KEY_ENV_KEY,REGION_NAME
+from us_visa.constants import AWS_ACCESS_KEY_ID_ENV_KEY,AWS_SECRET_ACCESS_KEY_ENV_KEY,AWS_S3_ENDPOINT_URL_ENV_KEY,REGION_NAME
 
 
 # class S3Client:
@@ -40,7 +40,8 @@ class S3Client:
     def __init__(self, region_name=REGION_NAME):
         """ 
         This Class gets aws credentials from env_variable and creates an connection with s3 bucket 
-        and raise exception when environment variable is not set
+        and raise exception when environment variable is not set.
+        AWS_S3_ENDPOINT_URL optionally points the connection to another S3 compatible endpoint
         """
 
         if S3Client.s3_resource==None or S3Client.s3_client==None:
@@ -50,16 +51,19 @@ class S3Client:
                 raise Exception(f"Environment variable: {AWS_ACCESS_KEY_ID_ENV_KEY} is not not set.")
             if __secret_access_key is None:
                 raise Exception(f"Environment variable: {AWS_SECRET_ACCESS_KEY_ENV_KEY} is not set.")
+            __endpoint_url = os.getenv(AWS_S3_ENDPOINT_URL_ENV_KEY, )
         
             S3Client.s3_resource = boto3.resource('s3',
                                             aws_access_key_id=__access_key_id,
                                             aws_secret_access_key=__secret_access_key,
-                                            region_name=region_name
+                                            region_name=region_name,
+                                            endpoint_url=__endpoint_url
                                             )
             S3Client.s3_client = boto3.client('s3',
                                         aws_access_key_id=__access_key_id,
                                         aws_secret_access_key=__secret_access_key,
-                                        region_name=region_name
+                                        region_name=region_name,
+                                        endpoint_url=__endpoint_url
                                         )
         self.s3_resource = S3Client.s3_resource
         self.s3_client = S3Client.s3_client
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os 
+from typing import Optional
 from datetime import date 
 
 DATABASE_NAME = 'US_VISA'
@@ -9,12 +10,15 @@ MONGODB_URL_KEY = "MONGODB_URL"
 
 PIPELINE_NAME: str = "usvisa"
 ARTIFACT_DIR: str ="artifact"
+# stages hand their outputs to the next stage in memory, artifact files are written in the background
+TRAINING_PIPELINE_IN_MEMORY_ARTIFACTS: bool = True
 
 MODEL_FILE_NAME = "model.pkl"
 
 TARGET_COLUMN = "case_status"
 CURRENT_YEAR = date.today().year
 PREPROCESSING_OBJECT_FILE_NAME = "preprocessing.pkl"
+COMPILED_PREPROCESSING_OBJECT_FILE_NAME = "compiled_preprocessing.pkl"
 
 FILE_NAME: str = "EasyVisa.csv"
 TRAIN_FILE_NAME: str = "train.csv"
@@ -23,6 +27,7 @@ SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 
 AWS_ACCESS_KEY_ID_ENV_KEY = "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY_ENV_KEY = "AWS_SECRET_ACCESS_KEY"
+AWS_S3_ENDPOINT_URL_ENV_KEY = "AWS_S3_ENDPOINT_URL" # optional, e.g. a local S3 stand-in
 REGION_NAME = "us-east-1"
 
 
@@ -37,6 +42,16 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_score"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+DATA_INGESTION_STREAMING_EXPORT: bool = True
+DATA_INGESTION_EXPORT_BATCH_SIZE: int = 10000
+DATA_INGESTION_EXPORT_PARALLELISM: int = 4 # concurrent _id range partitions read by an export
+DATA_INGESTION_FILE_FORMAT: str = "parquet" # parquet, feather or csv, of the feature store and train/test files
+DATA_INGESTION_COMPRESSION: str = "zstd" # parquet/feather codec
+DATA_INGESTION_SCHEMA_DTYPES: bool = True # memory saving dtypes of schema.yaml from the first read on
+DATA_INGESTION_INCREMENTAL: bool = True
+DATA_INGESTION_KEY_COLUMN: str = "case_id"
+DATA_INGESTION_STORE_DIR: str = os.path.join(ARTIFACT_DIR, "feature_store") # shared by all runs, unlike the per run artifact dir
+DATA_INGESTION_STATE_FILE_NAME: str = "ingestion_state.yaml"
 
 """
 Data Validation constant start with DATA_VALIDATION VAR NAME
@@ -45,6 +60,13 @@ Data Validation constant start with DATA_VALIDATION VAR NAME
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "data_report"
 DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+DATA_VALIDATION_SERVER_SIDE_PROFILING: bool = False # profile the collection in MongoDB instead of the train/test files
+DATA_VALIDATION_PROFILE_FILE_NAME: str = "profile.yaml"
+DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH: str = os.path.join(DATA_INGESTION_STORE_DIR, "reference_profile.yaml")
+DATA_VALIDATION_HISTOGRAM_BUCKETS: int = 10
+DATA_VALIDATION_MAX_CATEGORIES: int = 100 # frequency table size limit, identifier columns like case_id exceed it
+DATA_VALIDATION_DRIFT_P_VALUE: float = 0.05 # a column drifted when its chi-square test p value is below
+DATA_VALIDATION_DRIFT_SHARE: float = 0.5 # the dataset drifted when at least this share of columns drifted
 
 
 """
@@ -62,6 +84,12 @@ MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6 # binary classification threshold score.
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config","model.yaml")
+MODEL_TRAINER_KNN_PROTOTYPE_REDUCTION: bool = True
+# largest batch scored by the flattened forest, larger batches go to the sklearn forest
+# (benchmarks/flat_forest_benchmark.py: the flat forest wins up to 256 rows, loses from 512 on).
+# Both are pickled, about 1.35x the sklearn forest alone; None ships only the flat forest (about 0.35x)
+MODEL_TRAINER_FLAT_FOREST_MAX_ROWS: Optional[int] = 256
+MODEL_TRAINER_KNN_MAX_F1_DROP: float = 0.01 # largest test f1 loss accepted for a reduced KNN reference set
 
 """
 Model Evaluation Constants
@@ -72,3 +100,58 @@ MODEL_PUSHER_S3_KEY ="model=registry"
 
 APP_HOST = "0.0.0.0"
 APP_PORT = "8080"
+APP_WORKERS: int = 1
+
+"""
+Model serving related constant start with MODEL_CACHE VAR NAME
+"""
+MODEL_CACHE_REVALIDATE_INTERVAL_SECONDS: float = 300.0
+# directory of the memory mapped model files shared by the workers, None disables sharing. Shares KNN reference
+# sets and flat forest arrays, not sklearn trees. The files are unpickled, so it must be private to the
+# service user: it is created 0700 and refused otherwise
+MODEL_CACHE_MMAP_DIR: Optional[str] = None
+MODEL_WATCHER_POLL_INTERVAL_SECONDS: float = 30.0 # 0 disables the background watcher
+MODEL_SWAP_HISTORY_SIZE: int = 10
+PREDICTION_BATCH_CHUNK_SIZE: int = 5000
+PREDICTION_BATCHER_MAX_BATCH_SIZE: int = 64
+PREDICTION_BATCHER_MAX_WAIT_SECONDS: float = 0.005
+INFERENCE_EXECUTOR_KIND: str = "thread" # "thread" or "process"
+INFERENCE_EXECUTOR_MAX_WORKERS: int = 4
+INFERENCE_EXECUTOR_MAX_PENDING: int = 64
+PREDICTION_CACHE_MAX_SIZE: int = 0 # 0 disables the prediction cache
+PREDICTION_CACHE_TTL_SECONDS: float = 3600.0
+MODEL_WARMUP_N_ROWS: int = 64
+MODEL_WARMUP_RETRY_SECONDS: float = 10.0
+PREDICTION_INPUT_COLUMNS = [
+    "continent",
+    "education_of_employee",
+    "has_job_experience",
+    "requires_job_training",
+    "no_of_employees",
+    "region_of_employment",
+    "prevailing_wage",
+    "unit_of_wage",
+    "full_time_position",
+    "company_age",
+]
+
+"""
+Batch prediction related constant start with BATCH_PREDICTION VAR NAME
+"""
+BATCH_PREDICTION_CHUNK_SIZE: int = 50000
+BATCH_PREDICTION_N_WORKERS: int = os.cpu_count() or 1
+BATCH_PREDICTION_PREDICTION_COLUMN: str = "prediction"
+
+
+"""
+Training job related constant start with TRAINING_JOB VAR NAME
+"""
+TRAINING_PIPELINE_STAGES = ["data_ingestion", "data_validation", "data_transformation",
+                            "model_trainer", "model_evaluation", "model_pusher"]
+TRAINING_JOB_MAX_CONCURRENT: int = 1
+TRAINING_JOB_MAX_QUEUED: int = 10
+TRAINING_JOB_POLL_INTERVAL_SECONDS: float = 1.0
+# job state shared by every serving process (uvicorn workers), the limits above apply to the whole service
+TRAINING_JOB_STATE_DIR: str = os.path.join(ARTIFACT_DIR, "training_jobs")
+# a running job whose serving process stopped refreshing it for this long is marked failed
+TRAINING_JOB_HEARTBEAT_TIMEOUT_SECONDS: float = 30.0
@@ -1,10 +1,20 @@
 from us_visa.configuration.mongo_db_connection import MongoDBClient
 from us_visa.constants import DATABASE_NAME
 from us_visa.exception import USVisaException
+from us_visa.logger import logging
 import pandas as pd
+import os
+import shutil
 import sys
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 import numpy as np
+from bson import ObjectId
+from pymongo import ASCENDING
+
+# (lower inclusive, upper exclusive) bounds of a range of _id, None for an open bound
+IdRange = Tuple[Optional[ObjectId], Optional[ObjectId]]
 
 
 class USVisaData:
@@ -19,6 +29,11 @@ class USVisaData:
         except Exception as e:
             raise USVisaException(e, sys)
         
+    def get_collection(self, collection_name:str, database_name:Optional[str] = None):
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
     def export_collection_as_dataframe(self, collection_name:str, database_name:Optional[str] = None) -> pd.DataFrame:
         
         try:
@@ -27,10 +42,7 @@ class USVisaData:
             export entire collection as dataframe:
             return pd.DataFrame of collection
             """
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client.database[database_name][collection_name]
+            collection = self.get_collection(collection_name, database_name)
             
             df = pd.DataFrame(list(collection.find()))
             if "id" in df.columns.to_list():
@@ -41,3 +53,201 @@ class USVisaData:
             return df
         except Exception as e:
             raise USVisaException(e, sys)
+
+    def iter_collection_batches(self, collection_name:str, columns:List[str], batch_size:int,
+                                database_name:Optional[str] = None, after_id:Optional[ObjectId] = None,
+                                with_id:bool = False, id_range:Optional[IdRange] = None) -> Iterator[pd.DataFrame]:
+        """
+        Reads the collection batch_size documents at a time, projected to columns.
+        Every batch is decoded column by column into a DataFrame with "na" already replaced by NaN,
+        so only one batch of documents is held in memory.
+        :param after_id: Only documents with a greater _id are read
+        :param with_id: Every batch carries an extra "_id" column
+        :param id_range: Only documents with lower <= _id < upper are read, None bounds are open
+        Documents are read in _id order whenever an _id is involved (after_id, with_id or id_range).
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            projection = dict.fromkeys(columns, 1)
+            projection["_id"] = int(with_id)
+            id_query = {} if after_id is None else {"$gt": after_id}
+            if id_range is not None:
+                lower, upper = id_range
+                if lower is not None:
+                    id_query["$gte"] = lower
+                if upper is not None:
+                    id_query["$lt"] = upper
+            cursor = collection.find({"_id": id_query} if id_query else {}, projection=projection,
+                                     batch_size=batch_size)
+            if with_id or after_id is not None or id_range is not None:
+                cursor = cursor.sort("_id", ASCENDING)
+            if with_id:
+                columns = columns + ["_id"]
+            try:
+                while True:
+                    documents = list(islice(cursor, batch_size))
+                    if not documents:
+                        break
+                    batch = pd.DataFrame({column: [document.get(column, np.nan) for document in documents]
+                                          for column in columns})
+                    batch.replace({"na": np.nan}, inplace=True)
+                    yield batch
+            finally:
+                cursor.close()
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def get_id_ranges(self, collection_name:str, n_partitions:int, database_name:Optional[str] = None,
+                      after_id:Optional[ObjectId] = None) -> List[IdRange]:
+        """
+        Splits the documents (above after_id) into at most n_partitions _id ranges of about the same size.
+        Split points are the _id found at every count / n_partitions position of the _id index.
+        :return: (lower inclusive, upper exclusive) ranges in _id order, the outer bounds are None
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            query = {} if after_id is None else {"_id": {"$gt": after_id}}
+            count = collection.count_documents(query)
+            split_points = []
+            for partition in range(1, n_partitions):
+                cursor = collection.find(query, projection={"_id": 1}).sort("_id", ASCENDING) \
+                    .skip(partition * count // n_partitions).limit(1)
+                document = next(cursor, None)
+                if document is not None and (not split_points or document["_id"] > split_points[-1]):
+                    split_points.append(document["_id"])
+            return list(zip([None] + split_points, split_points + [None]))
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def export_collection_to_csv(self, collection_name:str, file_path:str, columns:List[str], batch_size:int,
+                                 database_name:Optional[str] = None, n_partitions:int = 1,
+                                 after_id:Optional[ObjectId] = None, with_id:bool = False) -> int:
+        """
+        Streams the collection into a csv file batch by batch, memory is bounded by batch_size and not
+        by the size of the collection. The file is written next to file_path and moved in place once complete.
+        With n_partitions > 1 the collection is split into _id ranges that are read concurrently, one thread
+        and pooled connection each, into their own part files; the part files are then concatenated in _id
+        order, so the output does not depend on n_partitions or on thread timing.
+        :param after_id: Only documents with a greater _id are exported
+        :param with_id: The file gets an extra "_id" column, last
+        :return: number of records written
+        """
+        try:
+            if n_partitions > 1:
+                id_ranges = self.get_id_ranges(collection_name, n_partitions, database_name, after_id)
+            else:
+                id_ranges = [None]
+
+            def export_partition(partition:int) -> int:
+                n_partition_records = 0
+                with open(f"{file_path}.part{partition}", "w", newline="") as part_file:
+                    for batch in self.iter_collection_batches(collection_name, columns, batch_size, database_name,
+                                                              after_id=after_id, with_id=with_id,
+                                                              id_range=id_ranges[partition]):
+                        batch.to_csv(part_file, index=False, header=False)
+                        n_partition_records += len(batch)
+                return n_partition_records
+
+            part_file_paths = [f"{file_path}.part{partition}" for partition in range(len(id_ranges))]
+            try:
+                with ThreadPoolExecutor(max_workers=len(id_ranges), thread_name_prefix="mongo-export") as executor:
+                    n_records = sum(executor.map(export_partition, range(len(id_ranges))))
+
+                temporary_file_path = f"{file_path}.part"
+                with open(temporary_file_path, "w", newline="") as file_obj:
+                    pd.DataFrame(columns=columns + ["_id"] if with_id else columns).to_csv(file_obj, index=False)
+                    for part_file_path in part_file_paths:
+                        with open(part_file_path) as part_file:
+                            shutil.copyfileobj(part_file, file_obj)
+                os.replace(temporary_file_path, file_path)
+            finally:
+                for part_file_path in part_file_paths:
+                    if os.path.exists(part_file_path):
+                        os.remove(part_file_path)
+            logging.info(f"Exported {n_records} records of {collection_name} to {file_path} "
+                         f"from {len(id_ranges)} partitions")
+            return n_records
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def profile_collection(self, collection_name:str, columns:List[str], categorical_columns:List[str],
+                           numerical_columns:List[str], n_buckets:int, max_categories:int,
+                           boundaries:Optional[Dict[str, List[float]]] = None,
+                           database_name:Optional[str] = None) -> dict:
+        """
+        Computes validation statistics inside MongoDB with two aggregation pipelines, only the summaries
+        come back: null counts ("na" counts as null) of columns, category frequencies of categorical_columns
+        and count/min/max/histogram of the numeric values of numerical_columns.
+        :param max_categories: Categorical columns with more categories keep only the max_categories most
+                               frequent ones and are listed in "truncated_categorical"
+        :param boundaries: Histogram bucket boundaries per numerical column (e.g. of a reference profile),
+                           columns without get n_buckets equal width buckets between their min and max
+        :return: {"count", "nulls": {column: n}, "categorical": {column: {category: n}}, "truncated_categorical",
+                  "numerical": {column: {"count", "min", "max", "boundaries", "histogram", "out_of_range"}}}
+        """
+        try:
+            collection = self.get_collection(collection_name, database_name)
+            boundaries = boundaries or {}
+
+            def is_null(column:str) -> dict:
+                return {"$cond": [{"$in": [{"$ifNull": [f"${column}", None]}, [None, "na"]]}, 1, 0]}
+
+            def is_number(column:str) -> dict:
+                return {"$match": {column: {"$type": "number"}}}
+
+            summary_facets = {"nulls": [{"$group": {"_id": None, "count": {"$sum": 1},
+                                                    **{column: {"$sum": is_null(column)} for column in columns}}}]}
+            for index, column in enumerate(categorical_columns):
+                summary_facets[f"categorical_{index}"] = [{"$group": {"_id": f"${column}", "count": {"$sum": 1}}},
+                                                          {"$sort": {"count": -1, "_id": 1}},
+                                                          {"$limit": max_categories + 2}] # null and "na" may take two rows
+            for index, column in enumerate(numerical_columns):
+                summary_facets[f"numerical_{index}"] = [is_number(column),
+                                                        {"$group": {"_id": None, "count": {"$sum": 1},
+                                                                    "min": {"$min": f"${column}"},
+                                                                    "max": {"$max": f"${column}"}}}]
+            summary = next(collection.aggregate([{"$facet": summary_facets}]))
+
+            nulls = (summary["nulls"] or [{"count": 0}])[0]
+            profile = {"count": nulls.pop("count"),
+                       "nulls": {column: nulls.get(column, 0) for column in columns},
+                       "categorical": {}, "truncated_categorical": [], "numerical": {}}
+            for index, column in enumerate(categorical_columns):
+                frequencies = {str(row["_id"]): row["count"] for row in summary[f"categorical_{index}"]
+                               if row["_id"] is not None and row["_id"] != "na"}
+                if len(frequencies) > max_categories:
+                    # identifier like column, only its most frequent categories are kept
+                    frequencies = dict(list(frequencies.items())[:max_categories])
+                    profile["truncated_categorical"].append(column)
+                profile["categorical"][column] = frequencies
+
+            histogram_facets = {}
+            for index, column in enumerate(numerical_columns):
+                numeric = (summary[f"numerical_{index}"] or [{"count": 0, "min": None, "max": None}])[0]
+                column_boundaries = boundaries.get(column)
+                if column_boundaries is None and numeric["count"]:
+                    edges = np.linspace(numeric["min"], numeric["max"], n_buckets + 1)
+                    # the upper boundary is exclusive
+                    edges[-1] = np.nextafter(float(numeric["max"]), np.inf)
+                    column_boundaries = sorted({float(edge) for edge in edges})
+                profile["numerical"][column] = {"count": numeric["count"], "min": numeric["min"],
+                                                "max": numeric["max"], "boundaries": column_boundaries,
+                                                "histogram": [], "out_of_range": 0}
+                if column_boundaries is not None and len(column_boundaries) > 1:
+                    histogram_facets[f"numerical_{index}"] = [
+                        is_number(column),
+                        {"$bucket": {"groupBy": f"${column}", "boundaries": column_boundaries,
+                                     "default": "out_of_range", "output": {"count": {"$sum": 1}}}}]
+
+            if histogram_facets:
+                histograms = next(collection.aggregate([{"$facet": histogram_facets}]))
+                for index, column in enumerate(numerical_columns):
+                    column_profile = profile["numerical"][column]
+                    if f"numerical_{index}" not in histograms:
+                        continue
+                    counts = {row["_id"]: row["count"] for row in histograms[f"numerical_{index}"]}
+                    column_profile["out_of_range"] = counts.pop("out_of_range", 0)
+                    column_profile["histogram"] = [counts.get(lower, 0) for lower in column_profile["boundaries"][:-1]]
+            return profile
+        except Exception as e:
+            raise USVisaException(e, sys) from e
@@ -1,9 +1,19 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+    from pandas import DataFrame
+
+# The live objects of an in memory run (see us_visa.utils.artifact_writer) ride along with the file paths,
+# consumers fall back to the files when they are None.
 
 @dataclass
 class DataInjectionArtifact:
     trained_file_path:str
     test_file_path:str
+    train_df:Optional["DataFrame"] = field(default=None, repr=False, compare=False)
+    test_df:Optional["DataFrame"] = field(default=None, repr=False, compare=False)
 
 @dataclass
 class DataValidationArtifact:
@@ -16,6 +26,11 @@ class DataTransformationArtifact:
     transformed_object_file_path:str
     transformed_train_file_path:str
     transformed_test_file_path:str
+    compiled_object_file_path:Optional[str] = None
+    train_arr:Optional["np.ndarray"] = field(default=None, repr=False, compare=False)
+    test_arr:Optional["np.ndarray"] = field(default=None, repr=False, compare=False)
+    preprocessing_object:Optional[object] = field(default=None, repr=False, compare=False)
+    compiled_preprocessing_object:Optional[object] = field(default=None, repr=False, compare=False)
     
 @dataclass
 class ClassificationMetricArtifact:
@@ -23,10 +38,33 @@ class ClassificationMetricArtifact:
     precision_score:float
     recall_score:float
 
+@dataclass
+class ForestExportArtifact:
+    engine:str
+    max_flat_rows:Optional[int]
+    model_size_bytes_before:int
+    model_size_bytes_flat:int
+    model_size_bytes_after:int
+
+@dataclass
+class KNNReductionArtifact:
+    engine:str
+    is_reduced:bool
+    n_prototypes_before:int
+    n_prototypes_after:int
+    model_size_bytes_before:int
+    model_size_bytes_after:int
+    test_latency_seconds_before:float
+    test_latency_seconds_after:float
+    f1_score_before:float
+    f1_score_after:float
+
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path:str
     metric_artifact:ClassificationMetricArtifact
+    forest_export_artifact:Optional[ForestExportArtifact] = None
+    knn_reduction_artifact:Optional[KNNReductionArtifact] = None
 
 @dataclass
 class ModelEvaluatorArtifact:
@@ -0,0 +1,169 @@
+import sys
+from typing import List, Mapping
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, PowerTransformer, StandardScaler
+
+from us_visa.exception import USVisaException
+from us_visa.logger import logging
+
+
+def _category_indices(values, categories: np.ndarray, column: str) -> np.ndarray:
+    """
+    Maps raw category values to their index in the sorted categories array.
+    Categorical columns (e.g. decoded from Arrow dictionaries) are mapped through their codes,
+    only the distinct values are looked up.
+    """
+    categorical = getattr(values, "cat", None)
+    if categorical is not None:
+        codes = categorical.codes.to_numpy()
+        if (codes < 0).any():
+            raise ValueError(f"Found missing values in column [{column}]")
+        used = np.unique(codes)
+        dictionary_indices = np.zeros(len(categorical.categories), dtype=np.intp)
+        dictionary_indices[used] = _category_indices(np.asarray(categorical.categories)[used], categories, column)
+        return dictionary_indices[codes]
+
+    values = np.asarray(values).astype(str)
+    indices = np.searchsorted(categories, values)
+    indices = np.minimum(indices, len(categories) - 1)
+    unknown = categories[indices] != values
+    if unknown.any():
+        raise ValueError(f"Found unknown categories {sorted(set(values[unknown]))} in column [{column}]")
+    return indices
+
+
+def _yeo_johnson(x: np.ndarray, lmbda: float) -> np.ndarray:
+    out = np.zeros_like(x)
+    pos = x >= 0
+    eps = np.spacing(1.0)
+
+    if abs(lmbda) < eps:
+        out[pos] = np.log1p(x[pos])
+    else:
+        out[pos] = (np.power(x[pos] + 1, lmbda) - 1) / lmbda
+
+    if abs(lmbda - 2) > eps:
+        out[~pos] = -(np.power(-x[~pos] + 1, 2 - lmbda) - 1) / (2 - lmbda)
+    else:
+        out[~pos] = -np.log1p(-x[~pos])
+    return out
+
+
+class CompiledPreprocessor:
+    """
+    This class is a compact, pandas free copy of the fitted ColumnTransformer used for online scoring.
+    It keeps only precomputed arrays (sorted category tables, PowerTransformer lambdas and scaler
+    mean/scale) and goes straight from raw column values to the feature matrix with NumPy.
+    """
+
+    def __init__(self, steps: List[dict], n_features_out: int):
+        """
+        :param steps: One dict per ColumnTransformer block, see from_column_transformer
+        :param n_features_out: Number of columns of the transformed matrix
+        """
+        self.steps = steps
+        self.n_features_out = n_features_out
+
+    @staticmethod
+    def _compile_numeric(transformer: object) -> List[dict]:
+        if isinstance(transformer, Pipeline):
+            operations = []
+            for _, step in transformer.steps:
+                operations.extend(CompiledPreprocessor._compile_numeric(step))
+            return operations
+        if isinstance(transformer, PowerTransformer):
+            if transformer.method != "yeo-johnson":
+                raise ValueError(f"Unsupported PowerTransformer method: {transformer.method}")
+            operations = [{"op": "yeo_johnson", "lambdas": np.asarray(transformer.lambdas_, dtype=np.float64)}]
+            if transformer.standardize:
+                operations.extend(CompiledPreprocessor._compile_numeric(transformer._scaler))
+            return operations
+        if isinstance(transformer, StandardScaler):
+            return [{
+                "op": "scale",
+                "mean": None if transformer.mean_ is None else np.asarray(transformer.mean_, dtype=np.float64),
+                "scale": None if transformer.scale_ is None else np.asarray(transformer.scale_, dtype=np.float64),
+            }]
+        raise ValueError(f"Unsupported transformer: {type(transformer).__name__}")
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor: ColumnTransformer) -> "CompiledPreprocessor":
+        """
+        Exports a fitted ColumnTransformer made of OneHotEncoder, OrdinalEncoder, PowerTransformer
+        (yeo-johnson) and StandardScaler blocks. Raises ValueError for anything else.
+        """
+        try:
+            steps = []
+            n_features_out = 0
+            for name, transformer, columns in preprocessor.transformers_:
+                if isinstance(transformer, str):
+                    if transformer == "drop":
+                        continue
+                    raise ValueError(f"Unsupported transformer [{name}]: {transformer}")
+                columns = list(columns)
+                if isinstance(transformer, OneHotEncoder):
+                    if transformer.drop_idx_ is not None:
+                        raise ValueError("OneHotEncoder with drop is not supported")
+                    categories = [np.asarray(c).astype(str) for c in transformer.categories_]
+                    steps.append({"kind": "onehot", "columns": columns, "categories": categories,
+                                  "offset": n_features_out})
+                    n_features_out += sum(len(c) for c in categories)
+                elif isinstance(transformer, OrdinalEncoder):
+                    categories = [np.asarray(c).astype(str) for c in transformer.categories_]
+                    steps.append({"kind": "ordinal", "columns": columns, "categories": categories,
+                                  "offset": n_features_out})
+                    n_features_out += len(columns)
+                else:
+                    steps.append({"kind": "numeric", "columns": columns,
+                                  "operations": cls._compile_numeric(transformer),
+                                  "offset": n_features_out})
+                    n_features_out += len(columns)
+            logging.info(f"Compiled preprocessor with {len(steps)} blocks and {n_features_out} output features")
+            return cls(steps=steps, n_features_out=n_features_out)
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def transform(self, data: Mapping) -> np.ndarray:
+        """
+        :param data: DataFrame or dict mapping every input column to its array-like values
+        :return: Feature matrix in the column order of the original ColumnTransformer
+        """
+        columns = self.steps[0]["columns"]
+        n_rows = len(data[columns[0]])
+        out = np.zeros((n_rows, self.n_features_out), dtype=np.float64)
+        rows = np.arange(n_rows)
+
+        for step in self.steps:
+            offset = step["offset"]
+            if step["kind"] == "onehot":
+                for column, categories in zip(step["columns"], step["categories"]):
+                    out[rows, offset + _category_indices(data[column], categories, column)] = 1.0
+                    offset += len(categories)
+            elif step["kind"] == "ordinal":
+                for j, (column, categories) in enumerate(zip(step["columns"], step["categories"])):
+                    out[:, offset + j] = _category_indices(data[column], categories, column)
+            else:
+                block = np.column_stack([np.asarray(data[column], dtype=np.float64)
+                                         for column in step["columns"]])
+                for operation in step["operations"]:
+                    if operation["op"] == "yeo_johnson":
+                        for j, lmbda in enumerate(operation["lambdas"]):
+                            block[:, j] = _yeo_johnson(block[:, j], lmbda)
+                    else:
+                        if operation["mean"] is not None:
+                            block -= operation["mean"]
+                        if operation["scale"] is not None:
+                            block /= operation["scale"]
+                out[:, offset:offset + block.shape[1]] = block
+        return out
+
+    def check_parity(self, expected: np.ndarray, data: Mapping, rtol: float = 1e-7, atol: float = 1e-9) -> bool:
+        """
+        Compares transform(data) with the output of the original preprocessor on the same data
+        """
+        if hasattr(expected, "toarray"):
+            expected = expected.toarray()
+        return np.allclose(self.transform(data), expected, rtol=rtol, atol=atol)
@@ -1,6 +1,7 @@
 import os 
+from typing import Optional
 from us_visa.constants import *
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 
 
@@ -9,43 +10,108 @@ TIMESTAMP : str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
 @dataclass
 class TrainingPipeLineConfig:
     pipeline_name: str = PIPELINE_NAME
-    artifact_dir: str = os.path.join(ARTIFACT_DIR, TIMESTAMP)
-    timestamp: str =TIMESTAMP
+    timestamp: str = field(default_factory=lambda: datetime.now().strftime("%m_%d_%Y_%H_%M_%S"))
+    artifact_dir: str = None
+    in_memory_artifacts: bool = TRAINING_PIPELINE_IN_MEMORY_ARTIFACTS
     
-training_pipeline_config: TrainingPipeLineConfig = TrainingPipeLineConfig()
+    def __post_init__(self):
+        if self.artifact_dir is None:
+            self.artifact_dir = os.path.join(ARTIFACT_DIR, self.timestamp)
+    
+training_pipeline_config: TrainingPipeLineConfig = TrainingPipeLineConfig(timestamp=TIMESTAMP)
 
 @dataclass
 class DataIngestionConfig:
-    data_ingestion_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME)
-    feature_store_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR,FILE_NAME)
-    training_file_path: str = os.path.join(data_ingestion_dir,DATA_INGESTION_INGESTED_DIR,TRAIN_FILE_NAME)
-    testing_file_path: str = os.path.join(data_ingestion_dir,DATA_INGESTION_INGESTED_DIR,TEST_FILE_NAME)
+    artifact_dir: str = training_pipeline_config.artifact_dir
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    streaming_export: bool = DATA_INGESTION_STREAMING_EXPORT
+    export_batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE
+    export_parallelism: int = DATA_INGESTION_EXPORT_PARALLELISM
+    file_format: str = DATA_INGESTION_FILE_FORMAT
+    compression: str = DATA_INGESTION_COMPRESSION
+    schema_dtypes: bool = DATA_INGESTION_SCHEMA_DTYPES
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    full_resync: bool = False
+    key_column: str = DATA_INGESTION_KEY_COLUMN
+    store_dir: str = DATA_INGESTION_STORE_DIR
+    data_ingestion_dir: str = field(init=False)
+    raw_export_file_path: str = field(init=False)
+    feature_store_file_path: str = field(init=False)
+    training_file_path: str = field(init=False)
+    testing_file_path: str = field(init=False)
+    store_file_path: str = field(init=False)
+    state_file_path: str = field(init=False)
+    
+    def __post_init__(self):
+        self.data_ingestion_dir = os.path.join(self.artifact_dir, DATA_INGESTION_DIR_NAME)
+        extension = f".{self.file_format}"
+        self.raw_export_file_path = os.path.join(self.data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR,FILE_NAME)
+        self.feature_store_file_path = os.path.join(self.data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR,
+                                                    FILE_NAME.replace(".csv", extension))
+        self.training_file_path = os.path.join(self.data_ingestion_dir,DATA_INGESTION_INGESTED_DIR,
+                                               TRAIN_FILE_NAME.replace(".csv", extension))
+        self.testing_file_path = os.path.join(self.data_ingestion_dir,DATA_INGESTION_INGESTED_DIR,
+                                              TEST_FILE_NAME.replace(".csv", extension))
+        self.store_file_path = os.path.join(self.store_dir, FILE_NAME)
+        self.state_file_path = os.path.join(self.store_dir, DATA_INGESTION_STATE_FILE_NAME)
     
 @dataclass
 class DataValidationConfig:
-    data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir,DATA_VALIDATION_DIR_NAME)
-    drift_report_file_path: str = os.path.join(data_validation_dir,DATA_VALIDATION_DRIFT_REPORT_DIR,
-                                                                    DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+    artifact_dir: str = training_pipeline_config.artifact_dir
+    server_side_profiling: bool = DATA_VALIDATION_SERVER_SIDE_PROFILING
+    collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    reference_profile_file_path: str = DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH
+    histogram_buckets: int = DATA_VALIDATION_HISTOGRAM_BUCKETS
+    max_categories: int = DATA_VALIDATION_MAX_CATEGORIES
+    drift_p_value: float = DATA_VALIDATION_DRIFT_P_VALUE
+    drift_share: float = DATA_VALIDATION_DRIFT_SHARE
+    data_validation_dir: str = field(init=False)
+    drift_report_file_path: str = field(init=False)
+    profile_file_path: str = field(init=False)
+    
+    def __post_init__(self):
+        self.data_validation_dir = os.path.join(self.artifact_dir,DATA_VALIDATION_DIR_NAME)
+        self.drift_report_file_path = os.path.join(self.data_validation_dir,DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                                   DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+        self.profile_file_path = os.path.join(self.data_validation_dir, DATA_VALIDATION_PROFILE_FILE_NAME)
 
 @dataclass
 class DataTransformationConfig:
-    data_transformation_dir: str = os.path.join(training_pipeline_config.artifact_dir,DATA_TRANSFORMATION_DIR_NAME)
-    transformed_train_file_path: str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                    TRAIN_FILE_NAME.replace("csv","npy"))
-    transformed_test_file_path: str = os.path.join(data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                   TEST_FILE_NAME.replace("csv","npy"))
-    transformed_object_file_path: str = os.path.join(data_transformation_dir,
-                                                     DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
-                                                     PREPROCESSING_OBJECT_FILE_NAME)
+    artifact_dir: str = training_pipeline_config.artifact_dir
+    data_transformation_dir: str = field(init=False)
+    transformed_train_file_path: str = field(init=False)
+    transformed_test_file_path: str = field(init=False)
+    transformed_object_file_path: str = field(init=False)
+    compiled_object_file_path: str = field(init=False)
+    
+    def __post_init__(self):
+        self.data_transformation_dir = os.path.join(self.artifact_dir,DATA_TRANSFORMATION_DIR_NAME)
+        self.transformed_train_file_path = os.path.join(self.data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                        TRAIN_FILE_NAME.replace("csv","npy"))
+        self.transformed_test_file_path = os.path.join(self.data_transformation_dir,DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                       TEST_FILE_NAME.replace("csv","npy"))
+        self.transformed_object_file_path = os.path.join(self.data_transformation_dir,
+                                                         DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+                                                         PREPROCESSING_OBJECT_FILE_NAME)
+        self.compiled_object_file_path = os.path.join(self.data_transformation_dir,
+                                                      DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
+                                                      COMPILED_PREPROCESSING_OBJECT_FILE_NAME)
     
 @dataclass
 class ModelTrainerConfig:
-    model_trainer_dir:str = os.path.join(training_pipeline_config.artifact_dir, MODEL_TRAINER_DIR_NAME)
-    trained_model_file_path:str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR,MODEL_FILE_NAME)
+    artifact_dir: str = training_pipeline_config.artifact_dir
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    knn_prototype_reduction: bool = MODEL_TRAINER_KNN_PROTOTYPE_REDUCTION
+    knn_max_f1_drop: float = MODEL_TRAINER_KNN_MAX_F1_DROP
+    flat_forest_max_rows: Optional[int] = MODEL_TRAINER_FLAT_FOREST_MAX_ROWS
+    model_trainer_dir: str = field(init=False)
+    trained_model_file_path: str = field(init=False)
+    
+    def __post_init__(self):
+        self.model_trainer_dir = os.path.join(self.artifact_dir, MODEL_TRAINER_DIR_NAME)
+        self.trained_model_file_path = os.path.join(self.model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR,MODEL_FILE_NAME)
     
 @dataclass
 class ModelEvaluationConfig:
@@ -62,4 +128,27 @@ class ModelPusherConfig:
 class USVisaPredictionConfig:
     model_file_path: str = MODEL_FILE_NAME
     model_bucket_name: str = MODEL_BUCKET_NAME
-    
\ No newline at end of file
+    model_revalidate_interval: float = MODEL_CACHE_REVALIDATE_INTERVAL_SECONDS
+    model_mmap_dir: Optional[str] = MODEL_CACHE_MMAP_DIR
+    model_watch_interval: float = MODEL_WATCHER_POLL_INTERVAL_SECONDS
+    batch_chunk_size: int = PREDICTION_BATCH_CHUNK_SIZE
+    batcher_max_batch_size: int = PREDICTION_BATCHER_MAX_BATCH_SIZE
+    batcher_max_wait_seconds: float = PREDICTION_BATCHER_MAX_WAIT_SECONDS
+    executor_kind: str = INFERENCE_EXECUTOR_KIND
+    executor_max_workers: int = INFERENCE_EXECUTOR_MAX_WORKERS
+    executor_max_pending: int = INFERENCE_EXECUTOR_MAX_PENDING
+    prediction_cache_max_size: int = PREDICTION_CACHE_MAX_SIZE
+    prediction_cache_ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS
+    warmup_n_rows: int = MODEL_WARMUP_N_ROWS
+    warmup_retry_seconds: float = MODEL_WARMUP_RETRY_SECONDS
+    
+@dataclass
+class BatchPredictionConfig:
+    input_file_path: str
+    output_file_path: str
+    local_model_file_path: str = None
+    model_file_path: str = MODEL_FILE_NAME
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    chunk_size: int = BATCH_PREDICTION_CHUNK_SIZE
+    n_workers: int = BATCH_PREDICTION_N_WORKERS
+    prediction_column: str = BATCH_PREDICTION_PREDICTION_COLUMN
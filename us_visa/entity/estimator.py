@@ -1,10 +1,15 @@
 import sys
+from typing import TYPE_CHECKING
 
 from pandas import DataFrame
-from sklearn.pipeline import Pipeline
 
 from us_visa.exception import USVisaException
-from us_visa.logger import logging
+from us_visa.logger import hot_path_logging
+from us_visa.metrics import STAGE_LATENCY
+
+if TYPE_CHECKING:
+    # annotation only: scikit-learn gets imported when the pickled model is loaded, not with this module
+    from sklearn.pipeline import Pipeline
 
 class TargetValueMapping:
     def __init__(self):
@@ -18,13 +23,26 @@ class TargetValueMapping:
         return dict(zip(mapping_response.values(),mapping_response.keys()))
     
 class USVisaModel:
-    def __init__(self, preprocessing_object:Pipeline, trained_model_object:object):
+    def __init__(self, preprocessing_object:"Pipeline", trained_model_object:object,
+                 compiled_preprocessing_object:object = None):
         """
         :param preocessing_object: Input object of preprocessor
         :param trained_model_object: Input Object of trained model
+        :param compiled_preprocessing_object: Optional NumPy only copy of the preprocessor used for scoring
         """
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.compiled_preprocessing_object = compiled_preprocessing_object
+    
+    def transform(self, dataframe:DataFrame):
+        """
+        Transforms raw inputs with the compiled preprocessor when the model carries one,
+        otherwise with the sklearn preprocessing_object
+        """
+        compiled_preprocessing_object = getattr(self, "compiled_preprocessing_object", None)
+        if compiled_preprocessing_object is not None:
+            return compiled_preprocessing_object.transform(dataframe)
+        return self.preprocessing_object.transform(dataframe)
     
     def predict(self,dataframe:DataFrame) -> DataFrame:
         """
@@ -32,19 +50,39 @@ class USVisaModel:
         which guarantees that the inputs are in the same format as the training data
         At last it performs prediction on transformed features
         """
-        logging.info("Entered predict method of UTruckModel class")
+        hot_path_logging.info("Entered predict method of UTruckModel class")
         
         try:
-            logging.info("Using the trained model to get predictions")
+            hot_path_logging.info("Using the trained model to get predictions")
             
-            transformed_feature = self.preprocessing_object.transform(dataframe)
+            with STAGE_LATENCY.time("transform"):
+                transformed_feature = self.transform(dataframe)
             
-            logging.info("Used the trained model to get predictions")
+            hot_path_logging.info("Used the trained model to get predictions", extra={"rows": len(dataframe)})
             
-            return self.trained_model_object.predict(transformed_feature)
+            with STAGE_LATENCY.time("predict"):
+                return self.trained_model_object.predict(transformed_feature)
         except Exception as e:
             raise USVisaException(e, sys) from e
     
+    def get_sample_input(self, n_rows:int) -> DataFrame:
+        """
+        Builds n_rows synthetic raw records accepted by the preprocessor, categorical columns cycle
+        through the fitted categories and numerical columns get small positive values.
+        Used to warm up a freshly loaded model before it serves traffic.
+        """
+        sample = {}
+        for _, transformer, columns in self.preprocessing_object.transformers_:
+            if isinstance(transformer, str):
+                continue
+            if hasattr(transformer, "categories_"):
+                for column, categories in zip(columns, transformer.categories_):
+                    sample[column] = [categories[i % len(categories)] for i in range(n_rows)]
+            else:
+                for column in columns:
+                    sample.setdefault(column, [float(i + 1) for i in range(n_rows)])
+        return DataFrame(sample)
+    
     def __repr__(self):
         return f"{type(self.trained_model_object).__name__}()"
     
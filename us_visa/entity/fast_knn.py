@@ -0,0 +1,182 @@
+import sys
+from typing import Iterator, Tuple
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+
+from us_visa.exception import USVisaException
+from us_visa.logger import logging
+
+
+class BlockedKNeighborsClassifier:
+    """
+    This class scores with a k nearest neighbour vote over a fixed set of prototypes.
+    The neighbour search is brute force, computed block by block as ||x||^2 - 2 x.p + ||p||^2 so that
+    one matrix multiplication (BLAS) covers a whole block of queries, with the distance block bounded
+    by working_memory_mb.
+    """
+
+    def __init__(self, prototypes: np.ndarray, labels: np.ndarray, classes: np.ndarray,
+                 n_neighbors: int = 5, weights: str = "uniform", working_memory_mb: float = 64.0):
+        """
+        :param prototypes: Reference samples, shape (n_prototypes, n_features)
+        :param labels: Class index (into classes) of every prototype
+        :param classes: Class labels
+        :param n_neighbors: Number of neighbours voting
+        :param weights: "uniform" or "distance", same meaning as in KNeighborsClassifier
+        :param working_memory_mb: Size of one block of the query/prototype distance matrix
+        """
+        if weights not in ("uniform", "distance"):
+            raise ValueError(f"Unsupported weights: {weights}")
+        self.prototypes = np.ascontiguousarray(prototypes, dtype=np.float64)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.classes_ = classes
+        self.n_neighbors = min(n_neighbors, len(self.prototypes))
+        self.weights = weights
+        self.working_memory_mb = working_memory_mb
+        self.squared_norms = np.einsum("ij,ij->i", self.prototypes, self.prototypes)
+
+    @classmethod
+    def from_kneighbors(cls, knn: KNeighborsClassifier, **kwargs) -> "BlockedKNeighborsClassifier":
+        """
+        Copies the fitted reference set of a euclidean KNeighborsClassifier
+        """
+        if knn.effective_metric_ != "euclidean" or callable(knn.weights) or knn.outputs_2d_:
+            raise ValueError("Only single output euclidean KNeighborsClassifier with uniform/distance weights is supported")
+        return cls(prototypes=knn._fit_X, labels=knn._y, classes=knn.classes_,
+                   n_neighbors=knn.n_neighbors, weights=knn.weights, **kwargs)
+
+    @property
+    def nbytes(self) -> int:
+        return self.prototypes.nbytes + self.labels.nbytes + self.squared_norms.nbytes
+
+    def _blocks(self, n_rows: int) -> Iterator[slice]:
+        block_rows = max(1, int(self.working_memory_mb * 2 ** 20 // (8 * max(1, len(self.prototypes)))))
+        for start in range(0, n_rows, block_rows):
+            yield slice(start, start + block_rows)
+
+    def kneighbors(self, X: np.ndarray, n_neighbors: int = None,
+                   exclude_self: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param exclude_self: X are the prototypes themselves (same row order), each row skips its own index
+        :return: Distances and prototype indices of the nearest neighbours, closest first
+        """
+        X = np.asarray(X, dtype=np.float64)
+        k = self.n_neighbors if n_neighbors is None else n_neighbors
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype=np.int64)
+        for block in self._blocks(len(X)):
+            x = X[block]
+            squared = np.einsum("ij,ij->i", x, x)[:, None] - 2.0 * (x @ self.prototypes.T) + self.squared_norms
+            np.maximum(squared, 0.0, out=squared)
+            if exclude_self:
+                rows = np.arange(len(x))
+                squared[rows, rows + block.start] = np.inf
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k] if k < squared.shape[1] else \
+                np.argsort(squared, axis=1)[:, :k]
+            # the expansion loses precision when x and p are close (an exact match is rarely 0),
+            # the distances of the k neighbours found are computed again from the differences
+            differences = x[:, None, :] - self.prototypes[nearest]
+            nearest_squared = np.einsum("ijk,ijk->ij", differences, differences)
+            order = np.argsort(nearest_squared, axis=1, kind="stable")
+            indices[block] = np.take_along_axis(nearest, order, axis=1)
+            distances[block] = np.sqrt(np.take_along_axis(nearest_squared, order, axis=1))
+        return distances, indices
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        distances, indices = self.kneighbors(X)
+        if self.weights == "uniform":
+            weights = np.ones_like(distances)
+        else:
+            # an exact match gets all the weight, like sklearn
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / distances
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+        proba = np.zeros((len(distances), len(self.classes_)))
+        np.add.at(proba, (np.arange(len(distances))[:, None], self.labels[indices]), weights)
+        proba /= proba.sum(axis=1, keepdims=True)
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(n_prototypes={len(self.prototypes)}, n_neighbors={self.n_neighbors})"
+
+
+def edited_nearest_neighbours(prototypes: np.ndarray, labels: np.ndarray, n_neighbors: int = 3) -> np.ndarray:
+    """
+    Wilson editing: drops every prototype whose n_neighbors nearest other prototypes vote for another class.
+
+    :return: Boolean mask of the prototypes kept
+    """
+    search = BlockedKNeighborsClassifier(prototypes, labels, classes=np.unique(labels), n_neighbors=n_neighbors)
+    _, indices = search.kneighbors(prototypes, exclude_self=True)
+    votes = np.zeros((len(labels), labels.max() + 1))
+    np.add.at(votes, (np.arange(len(labels))[:, None], labels[indices]), 1.0)
+    return np.argmax(votes, axis=1) == labels
+
+
+def condensed_nearest_neighbour(prototypes: np.ndarray, labels: np.ndarray, block_size: int = 512,
+                                max_passes: int = 10, random_state: int = 42) -> np.ndarray:
+    """
+    Hart's condensed nearest neighbour, processed block by block: every prototype of a block that the
+    current store misclassifies with 1-NN is added to the store. Passes over the data repeat until no
+    prototype is added (the store is then 1-NN consistent with the whole set) or max_passes is reached.
+
+    :return: Boolean mask of the prototypes kept
+    """
+    order = np.random.RandomState(random_state).permutation(len(labels))
+    keep = np.zeros(len(labels), dtype=bool)
+    # one seed prototype per class
+    for label in np.unique(labels):
+        keep[order[labels[order] == label][0]] = True
+
+    for _ in range(max_passes):
+        added = 0
+        for start in range(0, len(order), block_size):
+            block = order[start:start + block_size]
+            block = block[~keep[block]]
+            if not len(block):
+                continue
+            store = np.flatnonzero(keep)
+            search = BlockedKNeighborsClassifier(prototypes[store], labels[store], classes=np.unique(labels),
+                                                 n_neighbors=1)
+            _, nearest = search.kneighbors(prototypes[block])
+            wrong = block[labels[store[nearest[:, 0]]] != labels[block]]
+            keep[wrong] = True
+            added += len(wrong)
+        if not added:
+            break
+    return keep
+
+
+def reduce_prototypes(knn: KNeighborsClassifier, condense: bool = True,
+                      edit_neighbors: int = 3) -> BlockedKNeighborsClassifier:
+    """
+    Shrinks the reference set of a fitted KNeighborsClassifier: edited nearest neighbours first removes
+    noisy and borderline prototypes, condensed nearest neighbour (when condense) then drops the redundant
+    interior ones.
+    """
+    try:
+        full_model = BlockedKNeighborsClassifier.from_kneighbors(knn)
+        prototypes, labels = full_model.prototypes, full_model.labels
+
+        edited = edited_nearest_neighbours(prototypes, labels, n_neighbors=edit_neighbors)
+        if len(np.unique(labels[edited])) < len(full_model.classes_):
+            edited[:] = True
+        prototypes, labels = prototypes[edited], labels[edited]
+
+        condensed = condensed_nearest_neighbour(prototypes, labels) if condense else np.ones(len(labels), dtype=bool)
+        # keep enough prototypes for the configured vote
+        if condensed.sum() < full_model.n_neighbors:
+            condensed[:] = True
+        logging.info(f"Reduced KNN prototypes from {len(full_model.prototypes)} to {edited.sum()} (edited) "
+                     f"and {condensed.sum()} (condensed)")
+        return BlockedKNeighborsClassifier(prototypes[condensed], labels[condensed], classes=full_model.classes_,
+                                           n_neighbors=full_model.n_neighbors, weights=full_model.weights,
+                                           working_memory_mb=full_model.working_memory_mb)
+    except Exception as e:
+        raise USVisaException(e, sys) from e
@@ -0,0 +1,188 @@
+import sys
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree._tree import TREE_LEAF
+
+from us_visa.exception import USVisaException
+from us_visa.logger import logging
+
+
+def _float32_at_most(values: np.ndarray) -> np.ndarray:
+    """
+    Rounds float64 values down to the largest float32 not above them. For a float32 x,
+    x <= threshold and x <= _float32_at_most(threshold) are then the same test.
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class FlatForestClassifier:
+    """
+    This class is a flattened copy of a fitted RandomForestClassifier used for scoring.
+    All trees live in one set of contiguous arrays (split feature, float32 threshold, children and
+    leaf class probabilities) and a batch walks every tree at once, one vectorized step per depth level.
+    predict/predict_proba reproduce the sklearn forest exactly.
+    """
+
+    # levels walked between two removals of the samples that already reached a leaf
+    COMPACT_EVERY: int = 4
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 node_leaf: np.ndarray, leaf_value: np.ndarray,
+                 roots: np.ndarray, max_depth: int, classes: np.ndarray, n_features_in: int):
+        """
+        :param feature: Split feature of every node (0 for leaves)
+        :param threshold: Split threshold of every node, float32
+        :param children: Left and right child of every node interleaved ([2 * node] left, [2 * node + 1]
+                         right), leaves point to themselves
+        :param node_leaf: Row of leaf_value of every leaf node, -1 for split nodes
+        :param leaf_value: Class probabilities of every leaf
+        :param roots: Node index of the root of every tree
+        :param max_depth: Depth of the deepest tree
+        :param classes: Class labels in the column order of leaf_value
+        :param n_features_in: Number of input features
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.node_leaf = node_leaf
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+
+    @classmethod
+    def from_random_forest(cls, forest: RandomForestClassifier) -> "FlatForestClassifier":
+        """
+        Exports a fitted single output RandomForestClassifier
+        """
+        try:
+            if getattr(forest, "n_outputs_", 1) != 1:
+                raise ValueError("Only single output forests are supported")
+            feature, threshold, children, node_leaf, leaf_value, roots = ([] for _ in range(6))
+            n_nodes = 0
+            n_leaves = 0
+            max_depth = 0
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                is_leaf = tree.children_left == TREE_LEAF
+                node_ids = np.arange(tree.node_count)
+                value = tree.value[is_leaf, 0, :]
+
+                feature.append(np.where(is_leaf, 0, tree.feature))
+                threshold.append(_float32_at_most(np.where(is_leaf, 0.0, tree.threshold)))
+                children.append(np.column_stack([np.where(is_leaf, node_ids, tree.children_left),
+                                                 np.where(is_leaf, node_ids, tree.children_right)]).ravel() + n_nodes)
+                leaf_ids = np.full(tree.node_count, -1)
+                leaf_ids[is_leaf] = np.arange(is_leaf.sum()) + n_leaves
+                node_leaf.append(leaf_ids)
+                leaf_value.append(value / value.sum(axis=1, keepdims=True))
+                roots.append(n_nodes)
+                n_nodes += tree.node_count
+                n_leaves += int(is_leaf.sum())
+                max_depth = max(max_depth, tree.max_depth)
+
+            index_dtype = np.int32 if n_nodes < np.iinfo(np.int32).max else np.int64
+            flat_forest = cls(
+                feature=np.concatenate(feature).astype(np.int32),
+                threshold=np.concatenate(threshold),
+                children=np.concatenate(children).astype(index_dtype),
+                node_leaf=np.concatenate(node_leaf).astype(index_dtype),
+                leaf_value=np.concatenate(leaf_value).astype(np.float64),
+                roots=np.asarray(roots, dtype=index_dtype),
+                max_depth=max_depth,
+                classes=forest.classes_,
+                n_features_in=forest.n_features_in_,
+            )
+            logging.info(f"Flattened forest of {len(roots)} trees into {n_nodes} nodes and {n_leaves} leaves")
+            return flat_forest
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Walks all (sample, tree) pairs through the forest together, one level per step. Pairs that
+        reached a leaf are dropped every COMPACT_EVERY levels so deep, unbalanced trees stay cheap.
+
+        :return: Leaf row of leaf_value reached by every sample in every tree, shape (n_samples, n_trees)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, expected (n_samples, {self.n_features_in_})")
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        index_dtype = self.children.dtype
+        flat_X = X.ravel()
+
+        nodes = np.tile(self.roots, n_samples)
+        row_offsets = np.repeat(np.arange(n_samples, dtype=index_dtype) * X.shape[1], n_trees)
+        positions = np.arange(n_samples * n_trees)
+        reached = np.empty(n_samples * n_trees, dtype=index_dtype)
+
+        for level in range(self.max_depth):
+            values = flat_X.take(row_offsets + self.feature.take(nodes))
+            nodes = self.children.take(2 * nodes + (values > self.threshold.take(nodes)))
+            if level % self.COMPACT_EVERY == self.COMPACT_EVERY - 1:
+                at_leaf = self.node_leaf.take(nodes) >= 0
+                reached[positions[at_leaf]] = nodes[at_leaf]
+                walking = ~at_leaf
+                nodes, row_offsets, positions = nodes[walking], row_offsets[walking], positions[walking]
+                if not len(nodes):
+                    break
+        reached[positions] = nodes
+        return self.node_leaf.take(reached).reshape(n_samples, n_trees)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        # (n_trees, n_samples, n_classes) summed over the first axis adds the trees in order like sklearn
+        proba = self.leaf_value[self.apply(X).T].sum(axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def check_parity(self, forest: RandomForestClassifier, X: np.ndarray) -> bool:
+        """
+        Checks that predictions and probabilities on X are identical to the ones of forest
+        """
+        return (np.array_equal(self.predict(X), forest.predict(X))
+                and np.array_equal(self.predict_proba(X), forest.predict_proba(X)))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(n_estimators={len(self.roots)})"
+
+
+class HybridForestClassifier:
+    """
+    This class keeps a fitted RandomForestClassifier together with its flattened copy and scores a batch with
+    the faster of the two for its size: the flat forest up to max_flat_rows rows (single predictions and
+    micro batches), the sklearn forest above (bulk scoring). Both give identical results. Both are pickled,
+    the model is larger than the sklearn forest alone.
+    """
+
+    def __init__(self, forest: RandomForestClassifier, flat_forest: FlatForestClassifier, max_flat_rows: int):
+        """
+        :param forest: Fitted sklearn forest
+        :param flat_forest: FlatForestClassifier exported from forest
+        :param max_flat_rows: Largest batch scored by flat_forest
+        """
+        self.forest = forest
+        self.flat_forest = flat_forest
+        self.max_flat_rows = max_flat_rows
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+
+    def _select(self, X: np.ndarray) -> object:
+        return self.flat_forest if len(X) <= self.max_flat_rows else self.forest
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self._select(X).predict_proba(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self._select(X).predict(X)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(n_estimators={len(self.flat_forest.roots)}, max_flat_rows={self.max_flat_rows})"
@@ -0,0 +1,259 @@
+import fcntl
+import os
+import re
+import stat
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import joblib
+
+from us_visa.constants import MODEL_CACHE_MMAP_DIR, MODEL_CACHE_REVALIDATE_INTERVAL_SECONDS, MODEL_SWAP_HISTORY_SIZE
+from us_visa.entity.estimator import USVisaModel
+from us_visa.entity.s3_estimator import USVisaEstimator
+from us_visa.exception import USVisaException
+from us_visa.logger import logging
+from us_visa.metrics import MODEL_LOADS, MODEL_RELOADS
+
+
+class USVisaModelHolder:
+    """
+    This class keeps one loaded production model per process and shares it between requests.
+    The model is downloaded once and afterwards only revalidated against the S3 object version
+    (ETag/LastModified, a HEAD request) once every revalidate_interval seconds.
+    With start_watcher the check moves to a background thread that loads, warms up and then swaps in
+    a new version, so no request ever pays for a reload.
+
+    With mmap_dir set, the downloaded model is stored once per version as an uncompressed joblib file
+    and every process (e.g. each uvicorn worker) loads it with mmap_mode="r". Only NumPy arrays held as
+    plain attributes are then shared page cache: the reference set of a KNN (sklearn or blocked), the
+    arrays of a FlatForestClassifier and the compiled preprocessor tables. sklearn trees copy their node
+    arrays into the process when unpickled, so a RandomForestClassifier, and the sklearn half of a
+    HybridForestClassifier, stay private to every worker; only a flat forest alone
+    (flat_forest_max_rows=None) is shared (benchmarks/mmap_sharing_benchmark.py).
+    Loading the file unpickles it, so mmap_dir is only used when it is a directory owned by this user and
+    closed to everyone else; otherwise the model is loaded from s3 into this process.
+    """
+
+    _instances: Dict[Tuple[str, str], "USVisaModelHolder"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, bucket_name: str, model_path: str,
+                 revalidate_interval: float = MODEL_CACHE_REVALIDATE_INTERVAL_SECONDS,
+                 mmap_dir: Optional[str] = MODEL_CACHE_MMAP_DIR):
+        """
+        :param bucket_name: Name of your model bucket
+        :param model_path: Location of your model in bucket
+        :param revalidate_interval: Seconds between two version checks of the model in the bucket
+        :param mmap_dir: Local directory of the memory mapped model files shared by all processes, None disables it
+        """
+        self.usvisa_estimator = USVisaEstimator(bucket_name=bucket_name, model_path=model_path)
+        self.revalidate_interval = revalidate_interval
+        self.mmap_dir = mmap_dir
+        self.loaded_at: Optional[float] = None
+        self.last_polled_at: Optional[float] = None
+        self.warmup_n_rows: int = 0
+        self.swap_history = deque(maxlen=MODEL_SWAP_HISTORY_SIZE)
+        self._current: Optional[Tuple[USVisaModel, str]] = None
+        self._last_checked: float = 0.0
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stopped = threading.Event()
+
+    @classmethod
+    def get_instance(cls, bucket_name: str, model_path: str,
+                     revalidate_interval: float = MODEL_CACHE_REVALIDATE_INTERVAL_SECONDS,
+                     mmap_dir: Optional[str] = MODEL_CACHE_MMAP_DIR) -> "USVisaModelHolder":
+        """
+        Returns the process wide holder of the bucket_name/model_path model, creating it on first use
+        """
+        key = (bucket_name, model_path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(bucket_name=bucket_name, model_path=model_path,
+                                          revalidate_interval=revalidate_interval, mmap_dir=mmap_dir)
+            return cls._instances[key]
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return None if self._current is None else self._current[1]
+
+    def get_model(self) -> USVisaModel:
+        """
+        Returns the loaded model. Only the first call of the process downloads the model,
+        later calls touch S3 only when the revalidate interval has elapsed.
+        """
+        return self.get_model_and_version()[0]
+
+    def get_model_and_version(self) -> Tuple[USVisaModel, str]:
+        """
+        Returns the loaded model together with its version, both taken from the same load.
+        Callers keep using the returned model for their whole request, a swap only affects later calls.
+        """
+        try:
+            if self._current is None:
+                with self._lock:
+                    if self._current is None:
+                        self._load()
+            elif not self.is_watching and time.monotonic() - self._last_checked >= self.revalidate_interval:
+                self._revalidate()
+            return self._current
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    @property
+    def is_watching(self) -> bool:
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def _get_bucket_version(self) -> str:
+        return self.usvisa_estimator.s3.get_object_version(key=self.usvisa_estimator.model_path,
+                                                           bucket_name=self.usvisa_estimator.bucket_name)
+
+    def _load(self, version: Optional[str] = None) -> None:
+        """
+        Downloads the model together with its version, warms it up and publishes it with a single
+        reference assignment. The version is read first so that a model pushed in between is picked
+        up again on the next check.
+        """
+        logging.info("Loading production model from s3 into the model holder")
+        start = time.perf_counter()
+        if version is None:
+            version = self._get_bucket_version()
+        model = None
+        if self.mmap_dir is not None:
+            try:
+                model = self._load_memory_mapped(version)
+            except PermissionError as e:
+                logging.info(f"Not sharing the model through memory mapped files: {e}")
+        if model is None:
+            model = self.usvisa_estimator.load_model()
+        if self.warmup_n_rows:
+            model.predict(model.get_sample_input(self.warmup_n_rows))
+
+        previous_version = self.model_version
+        if self._current is not None:
+            MODEL_RELOADS.inc()
+        MODEL_LOADS.inc()
+        self._current = (model, version)
+        self.loaded_at = time.time()
+        self._last_checked = time.monotonic()
+        self.swap_history.append({"version": version, "previous_version": previous_version,
+                                  "swapped_at": self.loaded_at, "load_seconds": time.perf_counter() - start})
+        logging.info(f"Loaded model [{model}] with version [{version}]")
+
+    def _revalidate(self) -> None:
+        """
+        Compares the bucket version with the loaded one and reloads on change. Only one thread checks
+        at a time, the others keep serving the current model meanwhile.
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._last_checked < self.revalidate_interval:
+                return
+            self._last_checked = time.monotonic()
+            version = self._get_bucket_version()
+            if version != self.model_version:
+                logging.info(f"Model version changed from [{self.model_version}] to [{version}]")
+                self._load(version)
+        except Exception as e:
+            logging.info(f"Model revalidation failed, keeping the loaded model: {e}")
+        finally:
+            self._lock.release()
+
+    def start_watcher(self, poll_interval: float, warmup_n_rows: int = 0) -> None:
+        """
+        Starts a daemon thread polling the model version every poll_interval seconds. A new version is
+        downloaded and warmed up with warmup_n_rows synthetic rows on the watcher thread and swapped in
+        afterwards, so requests never wait for a reload. Calling it again while watching is a no-op.
+        """
+        with self._lock:
+            self.warmup_n_rows = warmup_n_rows
+            if poll_interval <= 0 or self.is_watching:
+                return
+            self._watcher_stopped.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(poll_interval,),
+                                             name="model-watcher", daemon=True)
+            self._watcher.start()
+        logging.info(f"Started model watcher polling every {poll_interval}s")
+
+    def stop_watcher(self) -> None:
+        self._watcher_stopped.set()
+
+    def _watch(self, poll_interval: float) -> None:
+        while not self._watcher_stopped.wait(poll_interval):
+            try:
+                self.last_polled_at = time.time()
+                version = self._get_bucket_version()
+                if version == self.model_version:
+                    continue
+                logging.info(f"Model watcher found version [{version}], active is [{self.model_version}]")
+                with self._lock:
+                    self._load(version)
+            except Exception as e:
+                logging.info(f"Model watcher check failed, keeping the loaded model: {e}")
+
+    def get_status(self) -> dict:
+        """
+        Active model version, load and swap timestamps of this process
+        """
+        return {
+            "model_version": self.model_version,
+            "loaded_at": self.loaded_at,
+            "watching": self.is_watching,
+            "last_polled_at": self.last_polled_at,
+            "swap_history": list(self.swap_history),
+        }
+
+    def _load_memory_mapped(self, version: str) -> USVisaModel:
+        """
+        Maps the joblib file of version, the first process to get the file lock downloads and writes it.
+        Files of older versions are removed, processes still mapping them keep their pages until they swap.
+        """
+        self._check_private_dir(self.mmap_dir)
+        file_prefix = re.sub(r"[^A-Za-z0-9_.-]", "_", self.usvisa_estimator.model_path) + "-"
+        file_name = file_prefix + re.sub(r"[^A-Za-z0-9_.-]", "_", version) + ".joblib"
+        file_path = os.path.join(self.mmap_dir, file_name)
+
+        with open(os.path.join(self.mmap_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(file_path):
+                    logging.info(f"Writing memory mapped model file {file_path}")
+                    model = self.usvisa_estimator.load_model()
+                    joblib.dump(model, file_path + ".tmp")
+                    os.replace(file_path + ".tmp", file_path)
+                    for old_file_name in os.listdir(self.mmap_dir):
+                        if old_file_name.startswith(file_prefix) and old_file_name != file_name:
+                            os.remove(os.path.join(self.mmap_dir, old_file_name))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._check_private_path(file_path, stat.S_ISREG, forbidden_mode=0o022)
+        return joblib.load(file_path, mmap_mode="r")
+
+    @classmethod
+    def _check_private_dir(cls, dir_path: str) -> None:
+        """
+        Creates dir_path with mode 0700 if missing and checks that it is private to this user
+        :raises PermissionError: dir_path is not a directory (e.g. a symlink), is owned by another user or
+                                 is accessible to group or others
+        """
+        os.makedirs(dir_path, mode=0o700, exist_ok=True)
+        cls._check_private_path(dir_path, stat.S_ISDIR, forbidden_mode=0o077)
+
+    @staticmethod
+    def _check_private_path(path: str, is_type, forbidden_mode: int) -> None:
+        """
+        :raises PermissionError: path is not of type is_type (stat.S_ISDIR/S_ISREG, symlinks are refused),
+                                 is owned by another user or has one of the forbidden_mode permission bits
+        """
+        path_stat = os.lstat(path)
+        if not is_type(path_stat.st_mode):
+            raise PermissionError(f"{path} is not a {'directory' if is_type is stat.S_ISDIR else 'regular file'}")
+        if path_stat.st_uid != os.geteuid():
+            raise PermissionError(f"{path} is owned by uid {path_stat.st_uid}, not by this user")
+        if path_stat.st_mode & forbidden_mode:
+            raise PermissionError(f"{path} has mode {oct(path_stat.st_mode & 0o777)}, "
+                                  f"none of {oct(forbidden_mode)} may be set")
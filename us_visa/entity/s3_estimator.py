@@ -1,6 +1,7 @@
 from us_visa.cloud_storage.aws_storage import SimpleStorageService
 from us_visa.exception import USVisaException
 from us_visa.entity.estimator import USVisaModel
+from us_visa.metrics import STAGE_LATENCY
 import sys
 from pandas import DataFrame
 
@@ -33,7 +34,8 @@ class USVisaEstimator:
         Load the model from the model_path
         :return
         """
-        return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
+        with STAGE_LATENCY.time("model_load"):
+            return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
     
     def save_model(self,from_file,remove:bool= False)->None:
         """
@@ -1,5 +1,9 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import random
 
 from from_root import from_root
 from datetime import datetime
@@ -12,9 +16,125 @@ logs_path = os.path.join(from_root(),log_dir,LOG_FILE)
 
 os.makedirs(log_dir,exist_ok = True)
 
-logging.basicConfig(
-    filename=logs_path,
-    format="[%(asctime)s ]%(name)s-%(levelname)s-%(message)s",
-    level=logging.DEBUG,
-)
+LOG_LEVEL_ENV_KEY = "USVISA_LOG_LEVEL"
+LOG_SAMPLE_RATE_ENV_KEY = "USVISA_LOG_SAMPLE_RATE"
+HOT_PATH_LOGGER_NAME = "us_visa.hot_path"
 
+_RESERVED_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Appends the extra={...} fields of a record as key=value pairs, so that records stay greppable
+    and machine parsable: [time ]name-LEVEL-message rows=64 model_version=...
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = [f"{key}={value}" for key, value in record.__dict__.items()
+                  if key not in _RESERVED_RECORD_ATTRIBUTES]
+        return f"{message} {' '.join(fields)}" if fields else message
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """
+    Logger of the per request code paths. Keeps only a sample_rate share of the INFO and lower records,
+    decided before the record is built; warnings and errors are always logged.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0):
+        super().__init__(logger, None)
+        self.sample_rate = sample_rate
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        if level <= logging.INFO and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.logger.log(level, msg, *args, **kwargs)
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a listener thread of the same process: the record is enqueued as is and all
+    formatting (message, key/value fields, traceback) is left to the listener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_file_handler: logging.Handler = None
+_queue_handler: logging.handlers.QueueHandler = None
+_queue_listener: logging.handlers.QueueListener = None
+
+
+def _start_listener() -> None:
+    """
+    Starts the thread writing queued records to the file. Also run in forked children, where the
+    parent's listener thread does not exist anymore.
+    """
+    global _queue_listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _queue_listener = logging.handlers.QueueListener(_queue_handler.queue, _file_handler,
+                                                     respect_handler_level=True)
+    _queue_listener.start()
+
+
+def stop_logging() -> None:
+    """
+    Flushes the queued records and stops the listener thread
+    """
+    if _queue_listener is not None and _queue_listener._thread is not None:
+        _queue_listener.stop()
+
+
+def configure_logging(level: str = None, sample_rate: float = None, log_file_path: str = logs_path) -> None:
+    """
+    Routes every record of the root logger through a queue: the calling thread only enqueues the
+    record and a listener thread formats and writes it to log_file_path.
+
+    :param level: Root log level, defaults to the USVISA_LOG_LEVEL env variable or INFO
+    :param sample_rate: Share of the INFO/DEBUG records of the us_visa.hot_path logger that is kept,
+                        defaults to the USVISA_LOG_SAMPLE_RATE env variable or 1.0
+    :param log_file_path: File written by the listener
+    """
+    global _file_handler, _queue_handler
+    if level is None:
+        level = os.getenv(LOG_LEVEL_ENV_KEY, "INFO")
+    if sample_rate is None:
+        sample_rate = float(os.getenv(LOG_SAMPLE_RATE_ENV_KEY, "1.0"))
+
+    stop_logging()
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+
+    _file_handler = logging.FileHandler(log_file_path)
+    _file_handler.setFormatter(KeyValueFormatter("[%(asctime)s ]%(name)s-%(levelname)s-%(message)s"))
+    _queue_handler = _InProcessQueueHandler(queue.SimpleQueue())
+    root_logger.addHandler(_queue_handler)
+    root_logger.setLevel(level.upper() if isinstance(level, str) else level)
+    hot_path_logging.sample_rate = sample_rate
+    _start_listener()
+
+
+def set_log_level(level: str) -> None:
+    """
+    Changes the root log level at runtime
+    """
+    logging.getLogger().setLevel(level.upper())
+
+
+# Logger of the per request code paths (request parsing, model predict, S3 reads), sampled by
+# USVISA_LOG_SAMPLE_RATE so that high request rates do not flood the log file
+hot_path_logging = SampledLogger(logging.getLogger(HOT_PATH_LOGGER_NAME))
+
+configure_logging()
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _queue_handler is not None and _start_listener())
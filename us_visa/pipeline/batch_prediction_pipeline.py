@@ -0,0 +1,171 @@
+import os
+import sys
+from collections import deque
+from multiprocessing import Pool
+from typing import TYPE_CHECKING, Iterator
+
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.constants import CURRENT_YEAR
+from us_visa.entity.config_entity import BatchPredictionConfig
+from us_visa.entity.estimator import TargetValueMapping, USVisaModel
+from us_visa.entity.s3_estimator import USVisaEstimator
+from us_visa.exception import USVisaException
+from us_visa.logger import logging
+from us_visa.utils.main_utils import load_object
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+_worker_model: USVisaModel = None
+
+
+def _init_worker(batch_prediction_config: BatchPredictionConfig) -> None:
+    """
+    Loads the model once per worker process
+    """
+    global _worker_model
+    if batch_prediction_config.local_model_file_path is not None:
+        _worker_model = load_object(batch_prediction_config.local_model_file_path)
+    else:
+        _worker_model = USVisaEstimator(bucket_name=batch_prediction_config.model_bucket_name,
+                                        model_path=batch_prediction_config.model_file_path).load_model()
+
+
+def _score_chunk(chunk: DataFrame, prediction_column: str) -> DataFrame:
+    """
+    Derives company_age the same way ModelEvaluation does and appends the predicted label
+    """
+    if "company_age" not in chunk.columns:
+        chunk["company_age"] = CURRENT_YEAR - chunk["yr_of_estab"]
+    reverse_mapping = TargetValueMapping().reverse_mapping()
+    prediction = _worker_model.predict(chunk)
+    chunk[prediction_column] = [reverse_mapping[int(value)] for value in prediction]
+    return chunk
+
+
+class BatchPredictionPipeline:
+    """
+    This class rescores a whole CSV/Parquet case file. The input is streamed in chunks, chunks are
+    scored by worker processes that each load the model once and the output is written incrementally
+    in input order, so memory stays bounded by n_workers * chunk_size rows.
+    """
+
+    def __init__(self, batch_prediction_config: BatchPredictionConfig):
+        """
+        :param batch_prediction_config: Configuration for batch prediction
+        """
+        self.batch_prediction_config = batch_prediction_config
+
+    @staticmethod
+    def _is_parquet(file_path: str) -> bool:
+        return file_path.endswith((".parquet", ".pq"))
+
+    def get_output_schema(self, first_table: "pa.Table") -> "pa.Schema":
+        """
+        Method Name: get_output_schema
+        Description: This method fixes the schema of the parquet output before the first write. Column types
+                     are inferred per chunk (an int column turns float in a chunk with missing values, a column
+                     without any value is null or float), so the types of a parquet input are kept, other
+                     integer columns are widened to float64 and columns without any value in the first chunk
+                     become strings.
+
+        Output: Schema every scored chunk is cast to
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            input_file_path = self.batch_prediction_config.input_file_path
+            input_schema = pq.read_schema(input_file_path) if self._is_parquet(input_file_path) else pa.schema([])
+            fields = []
+            for field, column in zip(first_table.schema, first_table.columns):
+                if field.name in input_schema.names:
+                    field = field.with_type(input_schema.field(field.name).type)
+                elif column.null_count == len(column):
+                    field = field.with_type(pa.string())
+                elif pa.types.is_integer(field.type):
+                    field = field.with_type(pa.float64())
+                fields.append(field)
+            return pa.schema(fields)
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def read_chunks(self) -> Iterator[DataFrame]:
+        """
+        Method Name: read_chunks
+        Description: This method streams the input file in chunks of chunk_size rows
+
+        Output: Iterator of DataFrame chunks
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            input_file_path = self.batch_prediction_config.input_file_path
+            chunk_size = self.batch_prediction_config.chunk_size
+            if self._is_parquet(input_file_path):
+                import pyarrow.parquet as pq
+
+                for batch in pq.ParquetFile(input_file_path).iter_batches(batch_size=chunk_size):
+                    yield batch.to_pandas()
+            else:
+                yield from pd.read_csv(input_file_path, chunksize=chunk_size)
+        except Exception as e:
+            raise USVisaException(e, sys) from e
+
+    def run_pipeline(self) -> int:
+        """
+        Method Name: run_pipeline
+        Description: This method scores every chunk of the input file and writes the predictions
+
+        Output: Number of scored rows
+        On Failure: Write an exception log and then raise an exception
+        """
+        logging.info("Entered run_pipeline method of BatchPredictionPipeline class")
+        try:
+            config = self.batch_prediction_config
+            output_file_path = config.output_file_path
+            os.makedirs(os.path.dirname(output_file_path) or ".", exist_ok=True)
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+
+            parquet_writer = None
+            n_rows = 0
+            max_in_flight = 2 * config.n_workers
+            try:
+                with Pool(processes=config.n_workers, initializer=_init_worker, initargs=(config,)) as pool:
+                    in_flight = deque()
+                    chunks = self.read_chunks()
+                    exhausted = False
+                    while not exhausted or in_flight:
+                        while not exhausted and len(in_flight) < max_in_flight:
+                            chunk = next(chunks, None)
+                            if chunk is None:
+                                exhausted = True
+                            else:
+                                in_flight.append(pool.apply_async(_score_chunk, (chunk, config.prediction_column)))
+                        if not in_flight:
+                            break
+                        scored = in_flight.popleft().get()
+
+                        if self._is_parquet(output_file_path):
+                            import pyarrow as pa
+                            import pyarrow.parquet as pq
+
+                            table = pa.Table.from_pandas(scored, preserve_index=False)
+                            if parquet_writer is None:
+                                parquet_writer = pq.ParquetWriter(output_file_path, self.get_output_schema(table))
+                            parquet_writer.write_table(table.cast(parquet_writer.schema))
+                        else:
+                            scored.to_csv(output_file_path, mode="a", index=False, header=n_rows == 0)
+                        n_rows += len(scored)
+                        logging.info(f"Scored {n_rows} rows into {output_file_path}")
+            finally:
+                # a run that failed still leaves a readable file with the rows scored so far
+                if parquet_writer is not None:
+                    parquet_writer.close()
+            logging.info("Exited run_pipeline method of BatchPredictionPipeline class")
+            return n_rows
+        except Exception as e:
+            raise USVisaException(e, sys) from e
@@ -0,0 +1,66 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from us_visa.constants import (INFERENCE_EXECUTOR_KIND, INFERENCE_EXECUTOR_MAX_PENDING,
+                               INFERENCE_EXECUTOR_MAX_WORKERS)
+from us_visa.logger import logging
+
+
+class InferenceOverloadedError(Exception):
+    """
+    Raised when more than max_pending calls are already waiting on the inference executor
+    """
+
+
+class InferenceExecutor:
+    """
+    This class runs CPU bound work (pandas, sklearn transform and predict, model download, training)
+    on a thread or process pool so that the asyncio event loop only does I/O.
+    """
+
+    def __init__(self, kind: str = INFERENCE_EXECUTOR_KIND,
+                 max_workers: int = INFERENCE_EXECUTOR_MAX_WORKERS,
+                 max_pending: int = INFERENCE_EXECUTOR_MAX_PENDING):
+        """
+        :param kind: "thread" or "process"
+        :param max_workers: Size of the pool
+        :param max_pending: Maximum number of submitted calls not yet finished, further calls are rejected
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending: int = 0
+        self._executor: Executor = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            logging.info(f"Starting {self.kind} inference executor with {self.max_workers} workers")
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="inference")
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) on the pool and awaits its result.
+        With a process pool fn and its arguments must be picklable.
+        """
+        if self.pending >= self.max_pending:
+            raise InferenceOverloadedError(f"Inference executor is saturated ({self.pending} pending calls)")
+        self.pending += 1
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
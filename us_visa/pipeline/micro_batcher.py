@@ -0,0 +1,139 @@
+import asyncio
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.constants import PREDICTION_BATCHER_MAX_BATCH_SIZE, PREDICTION_BATCHER_MAX_WAIT_SECONDS
+from us_visa.exception import USVisaException
+from us_visa.logger import logging
+from us_visa.pipeline.inference_executor import InferenceExecutor, InferenceOverloadedError
+
+
+class PredictionBatcher:
+    """
+    This class coalesces concurrent predictions into one vectorized model call.
+    Requests that arrive within max_wait_seconds of each other (up to max_batch_size rows) are
+    concatenated, scored with a single predict_fn call and the results are fanned back out
+    to the waiting coroutines.
+    """
+
+    def __init__(self, predict_fn: Callable[[DataFrame], np.ndarray],
+                 max_batch_size: int = PREDICTION_BATCHER_MAX_BATCH_SIZE,
+                 max_wait_seconds: float = PREDICTION_BATCHER_MAX_WAIT_SECONDS,
+                 executor: Optional[InferenceExecutor] = None,
+                 max_queue_depth: Optional[int] = None):
+        """
+        :param predict_fn: Function scoring a DataFrame and returning one prediction per row
+        :param max_batch_size: Maximum number of rows scored in one call
+        :param max_wait_seconds: Maximum time the first request of a batch waits for others to join
+        :param executor: Executor running predict_fn off the event loop, called inline when None.
+                         Up to executor.max_workers batches are scored concurrently.
+        :param max_queue_depth: Requests waiting beyond this depth are rejected, unbounded when None
+        """
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self.max_queue_depth = max_queue_depth
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.batch_size_histogram: Dict[int, int] = {}
+        self.total_batches: int = 0
+        self.total_requests: int = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._last_batch_size: int = 0
+
+    async def predict(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Queues the rows of dataframe for the next batch and waits for their predictions
+        """
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.executor.max_workers if self.executor is not None else 1)
+            self._worker = asyncio.ensure_future(self._run())
+        if self.max_queue_depth is not None and self._queue.qsize() >= self.max_queue_depth:
+            raise InferenceOverloadedError(f"Prediction queue is full ({self._queue.qsize()} waiting requests)")
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((dataframe, future))
+        return await future
+
+    def get_stats(self) -> dict:
+        """
+        Returns queue depth and batch size histogram (upper bucket bound -> number of batches)
+        """
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+        }
+
+    async def _collect(self) -> List[Tuple[DataFrame, asyncio.Future]]:
+        """
+        Waits for the first request and gathers followers until the batch is full or the window closes.
+        The window is skipped when the service is idle (nothing queued and the last batch was a single
+        request) so that a lone request does not pay the batching latency.
+        """
+        loop = asyncio.get_event_loop()
+        batch = [await self._queue.get()]
+        n_rows = len(batch[0][0])
+        deadline = loop.time() + self.max_wait_seconds
+        idle = self._queue.empty() and self._last_batch_size <= 1
+
+        while n_rows < self.max_batch_size:
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                timeout = deadline - loop.time()
+                if idle or timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _record(self, batch_size: int) -> None:
+        bucket = 1
+        while bucket < batch_size:
+            bucket *= 2
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+        self.total_batches += 1
+        self._last_batch_size = batch_size
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            batch = await self._collect()
+            self.total_requests += len(batch)
+            self._record(len(batch))
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[Tuple[DataFrame, asyncio.Future]]) -> None:
+        try:
+            frame = pd.concat([dataframe for dataframe, _ in batch], ignore_index=True)
+            predictions = await self._score(frame)
+            offset = 0
+            for dataframe, future in batch:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(dataframe)])
+                offset += len(dataframe)
+        except Exception as e:
+            logging.info(f"Batched prediction of {len(batch)} requests failed: {e}")
+            # overload is answered with 503 by the routes, so it reaches them as it is
+            error = e if isinstance(e, InferenceOverloadedError) else USVisaException(e, sys)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            self._slots.release()
+
+    async def _score(self, frame: DataFrame) -> np.ndarray:
+        if self.executor is None:
+            return np.asarray(self.predict_fn(frame))
+        return np.asarray(await self.executor.run(self.predict_fn, frame))
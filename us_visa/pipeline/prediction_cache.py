@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from us_visa.constants import PREDICTION_CACHE_MAX_SIZE, PREDICTION_CACHE_TTL_SECONDS
+
+
+class PredictionCache:
+    """
+    This class is a bounded LRU cache (with optional TTL) of predictions keyed on the canonicalized
+    applicant features. Entries belong to one model version, a different version empties the cache.
+    """
+
+    def __init__(self, max_size: int = PREDICTION_CACHE_MAX_SIZE, ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS):
+        """
+        :param max_size: Maximum number of cached predictions
+        :param ttl_seconds: Age after which an entry is not served anymore, 0 keeps entries until evicted
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.model_version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(values: tuple) -> tuple:
+        """
+        Canonicalizes one row of raw features: strings are stripped and numbers (also numeric strings
+        coming from the HTML form) become floats, so "14513", 14513 and 14513.0 share one entry.
+        """
+        key = []
+        for value in values:
+            if isinstance(value, str):
+                value = value.strip()
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+            key.append(value)
+        return tuple(key)
+
+    def _check_version(self, model_version: str) -> None:
+        if model_version != self.model_version:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, key: Hashable, model_version: str) -> Optional[Any]:
+        """
+        Returns the cached prediction of key for model_version, None on a miss
+        """
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, model_version: str) -> None:
+        with self._lock:
+            self._check_version(model_version)
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "model_version": self.model_version,
+        }
@@ -1,12 +1,20 @@
+import json
 import os
 import sys
 
 import numpy as np 
 import pandas as pd 
+import threading
+import time
+from typing import List, Optional
+from us_visa.constants import PREDICTION_INPUT_COLUMNS
 from us_visa.entity.config_entity import USVisaPredictionConfig
-from us_visa.entity.s3_estimator import USVisaEstimator
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.entity.model_holder import USVisaModelHolder
 from us_visa.exception import USVisaException
-from us_visa.logger import logging
+from us_visa.logger import hot_path_logging, logging
+from us_visa.metrics import STAGE_LATENCY
+from us_visa.pipeline.prediction_cache import PredictionCache
 from us_visa.utils.main_utils import read_yaml_file
 from pandas import DataFrame
 
@@ -58,7 +66,7 @@ class USVisaData:
         """_
         This function returns a dictionary from USVisaData class input
         """
-        logging.info("Entered get_usvisa_data_as_dict method as USVisaData class")
+        hot_path_logging.info("Entered get_usvisa_data_as_dict method as USVisaData class")
         try:
             input_data = {
                 "continent": [self.continent],
@@ -72,14 +80,104 @@ class USVisaData:
                 "full_time_position": [self.full_time_position],
                 "company_age": [self.company_age],
             }
-            logging.info("Created usvisa data dict")
-            logging.info("Exited get_usvisa_data_as_dict method as USVisa class")
+            hot_path_logging.info("Created usvisa data dict")
+            hot_path_logging.info("Exited get_usvisa_data_as_dict method as USVisa class")
             
             return input_data
         except Exception as e:
             raise USVisaException(e,sys) from e
         
+class USVisaBatchData:
+    def __init__(self, records: List[dict]):
+        """
+        USVisa Batch Data constructor
+
+        Input: list of applicant records, each one holding all features of the trained model
+        """
+        try:
+            self.records = records
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    @classmethod
+    def from_payload(cls, payload: bytes, ndjson: bool = False) -> "USVisaBatchData":
+        """
+        Parses a request body: a JSON list of records, a JSON object with a "records" list,
+        or NDJSON (one record per line) when ndjson
+        """
+        try:
+            if ndjson:
+                records = [json.loads(line) for line in payload.splitlines() if line.strip()]
+            else:
+                records = json.loads(payload)
+                if isinstance(records, dict):
+                    records = records["records"]
+            return cls(records=records)
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    def get_usvisa_input_data_frame(self) -> DataFrame:
+        """
+        This function returns one columnar DataFrame holding every record of the batch
+        """
+        try:
+            return DataFrame.from_records(self.records, columns=PREDICTION_INPUT_COLUMNS)
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+
+class USVisaArrowData:
+    def __init__(self, payload: bytes):
+        """
+        USVisa Arrow Data constructor
+
+        Input: Arrow IPC stream holding one column per feature of the trained model
+        """
+        try:
+            self.payload = payload
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    def get_usvisa_input_data_frame(self) -> DataFrame:
+        """
+        This function decodes the Arrow stream into a DataFrame. Numerical columns are zero copy NumPy
+        arrays and string columns become categoricals, so no Python object is created per row.
+        """
+        try:
+            import pyarrow as pa
+
+            table = pa.ipc.open_stream(self.payload).read_all()
+            missing_columns = [column for column in PREDICTION_INPUT_COLUMNS if column not in table.column_names]
+            if missing_columns:
+                raise ValueError(f"Missing feature columns: {missing_columns}")
+            return table.select(PREDICTION_INPUT_COLUMNS).to_pandas(strings_to_categorical=True)
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    @staticmethod
+    def encode_predictions(prediction: np.ndarray, column: str = "prediction") -> bytes:
+        """
+        This function returns the predicted class codes as an Arrow IPC stream with one dictionary encoded
+        column of TargetValueMapping labels
+        """
+        try:
+            import pyarrow as pa
+
+            reverse_mapping = TargetValueMapping().reverse_mapping()
+            labels = pa.array([reverse_mapping[code] for code in sorted(reverse_mapping)])
+            table = pa.table({column: pa.DictionaryArray.from_arrays(pa.array(prediction, type=pa.int8()), labels)})
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+
 class USVisaClassifier:
+    prediction_cache: Optional[PredictionCache] = None
+    _prediction_cache_lock = threading.Lock()
+
     def __init__(self,prediction_pipeline_config:USVisaPredictionConfig = USVisaPredictionConfig(), ) -> None:
         """
         :param prediction_pipeline_config: Configuration for prediction the value
@@ -88,23 +186,143 @@ class USVisaClassifier:
             self.prediction_pipeline_config = prediction_pipeline_config
         except Exception as e:
             raise USVisaException(e, sys) from e
+
+    def get_model_holder(self) -> USVisaModelHolder:
+        """
+        Returns the process wide holder of the production model, the model is loaded only once per process
+        """
+        return USVisaModelHolder.get_instance(
+            bucket_name=self.prediction_pipeline_config.model_bucket_name,
+            model_path=self.prediction_pipeline_config.model_file_path,
+            revalidate_interval=self.prediction_pipeline_config.model_revalidate_interval,
+            mmap_dir=self.prediction_pipeline_config.model_mmap_dir,
+        )
+
+    def get_prediction_cache(self) -> Optional[PredictionCache]:
+        """
+        Returns the process wide prediction cache, None when prediction_cache_max_size is 0
+        """
+        if self.prediction_pipeline_config.prediction_cache_max_size <= 0:
+            return None
+        with USVisaClassifier._prediction_cache_lock:
+            if USVisaClassifier.prediction_cache is None:
+                USVisaClassifier.prediction_cache = PredictionCache(
+                    max_size=self.prediction_pipeline_config.prediction_cache_max_size,
+                    ttl_seconds=self.prediction_pipeline_config.prediction_cache_ttl_seconds,
+                )
+            return USVisaClassifier.prediction_cache
         
     def predict(self,dataframe) -> str:
         """
         This is the method of USVisaClassifier
+        Rows already scored by the same model version are served from the prediction cache when enabled
         Returns: Prediction in string format
         """
         
         try:
-            logging.info("Entered predict method od USVisaClassifier class")
-            model = USVisaEstimator(
-                bucket_name=self.prediction_pipeline_config.model_bucket_name,
-                model_path=self.prediction_pipeline_config.model_file_path,
-            )
-            result = model.predict(dataframe)
+            hot_path_logging.info("Entered predict method od USVisaClassifier class")
+            model, model_version = self.get_model_holder().get_model_and_version()
+            prediction_cache = self.get_prediction_cache()
+            if prediction_cache is None:
+                return model.predict(dataframe)
+
+            keys = [PredictionCache.make_key(row) for row in
+                    dataframe[PREDICTION_INPUT_COLUMNS].itertuples(index=False, name=None)]
+            result = [prediction_cache.get(key, model_version) for key in keys]
+            missing = [i for i, value in enumerate(result) if value is None]
+            if missing:
+                prediction = model.predict(dataframe.iloc[missing])
+                for i, value in zip(missing, prediction):
+                    result[i] = value
+                    prediction_cache.put(keys[i], value, model_version)
             
-            return result
+            return np.asarray(result)
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    def warm_up(self, n_rows: int = None) -> dict:
+        """
+        This is the method of USVisaClassifier to load the production model and run a synthetic batch
+        (one single row call and one n_rows call) through it, bypassing the prediction cache.
+        Also starts the background watcher that swaps in new model versions of the bucket.
+        Returns: model version, load time in seconds and load timestamp
+        """
+        try:
+            logging.info("Entered warm_up method of USVisaClassifier class")
+            if n_rows is None:
+                n_rows = self.prediction_pipeline_config.warmup_n_rows
+            start = time.perf_counter()
+            model_holder = self.get_model_holder()
+            model, model_version = model_holder.get_model_and_version()
+            load_seconds = time.perf_counter() - start
+
+            sample_df = model.get_sample_input(n_rows)
+            model.predict(sample_df.iloc[:1])
+            model.predict(sample_df)
+            model_holder.start_watcher(poll_interval=self.prediction_pipeline_config.model_watch_interval,
+                                       warmup_n_rows=n_rows)
+
+            logging.info(f"Warmed up model version [{model_version}] in {time.perf_counter() - start:.3f}s")
+            return {"model_version": model_version, "load_seconds": load_seconds, "loaded_at": model_holder.loaded_at}
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    def get_prediction_cache_stats(self) -> Optional[dict]:
+        """
+        Returns the hit/miss/eviction counters of the prediction cache of this process, None without cache
+        """
+        prediction_cache = self.get_prediction_cache()
+        return None if prediction_cache is None else prediction_cache.get_stats()
+
+    def get_model_status(self) -> dict:
+        """
+        Returns the active model version and the swap timestamps of this process
+        """
+        return self.get_model_holder().get_status()
+
+    def predict_batch_codes(self, dataframe: DataFrame, chunk_size: int = None) -> np.ndarray:
+        """
+        This is the method of USVisaClassifier to score many records at once
+        The model is called once per chunk of chunk_size rows so that the transform memory stays bounded
+        Returns: Predicted class code of every row
+        """
+        try:
+            hot_path_logging.info("Entered predict_batch_codes method of USVisaClassifier class")
+            if chunk_size is None:
+                chunk_size = self.prediction_pipeline_config.batch_chunk_size
+            model = self.get_model_holder().get_model()
+
+            prediction = np.empty(len(dataframe), dtype=np.int64)
+            for start in range(0, len(dataframe), chunk_size):
+                prediction[start:start + chunk_size] = model.predict(dataframe.iloc[start:start + chunk_size])
+
+            hot_path_logging.info("Exited predict_batch_codes method of USVisaClassifier class",
+                                  extra={"rows": len(prediction)})
+            return prediction
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    def predict_batch_payload(self, payload: bytes, ndjson: bool = False, chunk_size: int = None) -> List[str]:
+        """
+        This is the method of USVisaClassifier to score a raw /predict/batch request body, parsing included,
+        so that large bodies are decoded on the inference executor and not on the event loop
+        Returns: Prediction label of every record
+        """
+        try:
+            with STAGE_LATENCY.time("dataframe_build"):
+                dataframe = USVisaBatchData.from_payload(payload, ndjson=ndjson).get_usvisa_input_data_frame()
+            return self.predict_batch(dataframe, chunk_size=chunk_size)
+        except Exception as e:
+            raise USVisaException(e,sys) from e
+
+    def predict_batch(self, dataframe: DataFrame, chunk_size: int = None) -> List[str]:
+        """
+        This is the method of USVisaClassifier to score many records at once
+        Returns: Prediction label of every row, mapped through TargetValueMapping
+        """
+        try:
+            reverse_mapping = TargetValueMapping().reverse_mapping()
+            prediction = self.predict_batch_codes(dataframe, chunk_size=chunk_size)
+            return [reverse_mapping[int(value)] for value in prediction]
         except Exception as e:
             raise USVisaException(e,sys) from e
-                
-            
\ No newline at end of file
@@ -0,0 +1,263 @@
+import fcntl
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from us_visa.constants import (ARTIFACT_DIR, TRAINING_JOB_HEARTBEAT_TIMEOUT_SECONDS, TRAINING_JOB_MAX_CONCURRENT,
+                               TRAINING_JOB_MAX_QUEUED, TRAINING_JOB_POLL_INTERVAL_SECONDS, TRAINING_JOB_STATE_DIR,
+                               TRAINING_PIPELINE_STAGES)
+from us_visa.logger import logging
+from us_visa.utils.main_utils import read_yaml_file, write_yaml_file
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    artifact_dir: str
+    full_resync: bool = False
+    status: str = "queued" # queued, running, succeeded, failed, cancelled
+    stage: Optional[str] = None
+    completed_stages: int = 0
+    total_stages: int = 0
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pid: Optional[int] = None # training worker process
+    heartbeat_at: Optional[float] = None # last refresh by the serving process that started the worker
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class TrainingQueueFullError(Exception):
+    """
+    Raised when max_queued jobs are already waiting to run
+    """
+
+
+def _run_training_job(job_id: str, artifact_dir: str, full_resync: bool, events: multiprocessing.Queue) -> None:
+    """
+    Entry point of the training worker process, runs one TrainPipeline in artifact_dir
+    """
+    from us_visa.entity.config_entity import TrainingPipeLineConfig
+    from us_visa.pipeline.training_pipeline import TrainPipeline
+
+    try:
+        train_pipeline = TrainPipeline(training_pipeline_config=TrainingPipeLineConfig(artifact_dir=artifact_dir),
+                                       progress_callback=lambda stage: events.put((job_id, "stage", stage)),
+                                       full_resync=full_resync)
+        train_pipeline.run_pipeline()
+        events.put((job_id, "succeeded", None))
+    except Exception as e:
+        events.put((job_id, "failed", f"{e}"))
+
+
+class TrainingJobManager:
+    """
+    This class runs TrainPipeline as submitted jobs, each one in its own worker process and artifact
+    directory, so training never runs on the serving event loop. At most max_concurrent jobs run at
+    the same time, further ones wait in a FIFO queue of at most max_queued jobs.
+
+    The jobs are kept in a state file under state_dir, read and written under a file lock, so every
+    serving process (each uvicorn worker has its own manager) sees and cancels the same jobs and the
+    limits hold for the whole service. A job runs as a child of the process that started it, which reports
+    its progress and refreshes its heartbeat; any process starts queued jobs when a slot is free and marks
+    a running job whose heartbeat is older than heartbeat_timeout (its serving process exited) as failed.
+    The state file also keeps the finished jobs of earlier runs.
+    """
+
+    def __init__(self, max_concurrent: int = TRAINING_JOB_MAX_CONCURRENT,
+                 max_queued: int = TRAINING_JOB_MAX_QUEUED,
+                 poll_interval: float = TRAINING_JOB_POLL_INTERVAL_SECONDS,
+                 state_dir: str = TRAINING_JOB_STATE_DIR,
+                 heartbeat_timeout: float = TRAINING_JOB_HEARTBEAT_TIMEOUT_SECONDS):
+        """
+        :param max_concurrent: Maximum number of training runs at the same time
+        :param max_queued: Maximum number of submitted jobs waiting for a free slot
+        :param poll_interval: Seconds between two checks of the running worker processes
+        :param state_dir: Directory of the job state file shared by all serving processes
+        :param heartbeat_timeout: Seconds without heartbeat after which a running job is marked failed
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.state_dir = state_dir
+        self.heartbeat_timeout = heartbeat_timeout
+        self.state_file_path = os.path.join(state_dir, "jobs.yaml")
+        self._context = multiprocessing.get_context("spawn")
+        self._events = None
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @contextmanager
+    def _locked_jobs(self) -> Iterator[Dict[str, TrainingJob]]:
+        """
+        Holds the state file lock, yields the jobs by id brought up to date by _poll and writes them back
+        """
+        with self._lock:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(os.path.join(self.state_dir, ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    state = read_yaml_file(self.state_file_path) if os.path.exists(self.state_file_path) else None
+                    jobs = {job_id: TrainingJob(**job) for job_id, job in (state or {}).items()}
+                    try:
+                        self._poll(jobs)
+                        yield jobs
+                    finally:
+                        # also when the caller raised, the events applied by _poll are consumed
+                        new_state = {job_id: job.to_dict() for job_id, job in jobs.items()}
+                        if new_state != state:
+                            write_yaml_file(self.state_file_path + ".tmp", new_state)
+                            os.replace(self.state_file_path + ".tmp", self.state_file_path)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def submit(self, full_resync: bool = False) -> TrainingJob:
+        """
+        Queues a new training run and returns its job
+        :param full_resync: The run rebuilds the feature store from the whole collection
+        """
+        with self._locked_jobs() as jobs:
+            n_queued = sum(job.status == "queued" for job in jobs.values())
+            if n_queued >= self.max_queued:
+                raise TrainingQueueFullError(f"{n_queued} training jobs are already queued")
+            job_id = uuid.uuid4().hex
+            timestamp = time.strftime("%m_%d_%Y_%H_%M_%S")
+            job = TrainingJob(job_id=job_id, artifact_dir=os.path.join(ARTIFACT_DIR, f"{timestamp}_{job_id[:8]}"),
+                              full_resync=full_resync)
+            jobs[job_id] = job
+            logging.info(f"Submitted training job {job_id}")
+            self._start_pending(jobs)
+        self._ensure_monitor()
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        with self._locked_jobs() as jobs:
+            return jobs.get(job_id)
+
+    def list_jobs(self) -> List[TrainingJob]:
+        with self._locked_jobs() as jobs:
+            return sorted(jobs.values(), key=lambda job: job.submitted_at)
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+        """
+        Cancels a queued job or terminates the worker process of a running one, also when another
+        serving process started it
+        """
+        with self._locked_jobs() as jobs:
+            job = jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return job
+            if job_id in self._processes:
+                process = self._processes.pop(job_id)
+                process.terminate()
+                process.join()
+            elif job.status == "running":
+                try:
+                    os.kill(job.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            logging.info(f"Cancelled training job {job_id}")
+            self._start_pending(jobs)
+            return job
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        if not self._processes:
+            return
+        with self._locked_jobs() as jobs:
+            for job_id in list(self._processes):
+                self._processes.pop(job_id).terminate()
+                if job_id in jobs:
+                    jobs[job_id].status = "cancelled"
+                    jobs[job_id].finished_at = time.time()
+
+    def _ensure_monitor(self) -> None:
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self._monitor_loop, name="training-jobs", daemon=True)
+            self._monitor.start()
+
+    def _monitor_loop(self) -> None:
+        while not self._stopped.wait(self.poll_interval):
+            with self._locked_jobs() as jobs:
+                if not self._processes and not any(job.status == "queued" for job in jobs.values()):
+                    self._monitor = None
+                    return
+
+    def _start_pending(self, jobs: Dict[str, TrainingJob]) -> None:
+        if self._events is None:
+            self._events = self._context.Queue()
+        n_running = sum(job.status == "running" for job in jobs.values())
+        pending = sorted((job for job in jobs.values() if job.status == "queued"), key=lambda job: job.submitted_at)
+        for job in pending[:max(0, self.max_concurrent - n_running)]:
+            process = self._context.Process(target=_run_training_job, name=f"training-{job.job_id[:8]}",
+                                            args=(job.job_id, job.artifact_dir, job.full_resync, self._events))
+            process.start()
+            self._processes[job.job_id] = process
+            job.status = "running"
+            job.started_at = time.time()
+            job.total_stages = len(TRAINING_PIPELINE_STAGES)
+            job.pid = process.pid
+            job.heartbeat_at = job.started_at
+            logging.info(f"Started training job {job.job_id} in {job.artifact_dir}")
+
+    def _poll(self, jobs: Dict[str, TrainingJob]) -> None:
+        """
+        Applies the events sent by the workers of this process, reaps its finished processes, refreshes
+        the heartbeat of its running jobs and fails the running jobs of serving processes that exited
+        """
+        while self._events is not None:
+            try:
+                job_id, event, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            job = jobs.get(job_id)
+            if job is None or job.status != "running":
+                continue
+            if event == "stage":
+                if job.stage is not None:
+                    job.completed_stages += 1
+                job.stage = value
+            else:
+                job.status = event
+                job.error = value
+                if event == "succeeded":
+                    job.completed_stages = job.total_stages
+                job.finished_at = time.time()
+
+        for job_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self._processes[job_id]
+            job = jobs.get(job_id)
+            if job is not None and job.status == "running":
+                job.status = "failed"
+                job.error = f"Training process exited with code {process.exitcode}"
+                job.finished_at = time.time()
+
+        now = time.time()
+        for job in jobs.values():
+            if job.status != "running":
+                continue
+            if job.job_id in self._processes:
+                job.heartbeat_at = now
+            elif now - job.heartbeat_at > self.heartbeat_timeout:
+                # nobody reports its progress any more, the serving process that started it exited
+                job.status = "failed"
+                job.error = f"Training job lost its serving process, no heartbeat for {now - job.heartbeat_at:.0f}s"
+                job.finished_at = now
+        self._start_pending(jobs)
@@ -2,14 +2,18 @@ from us_visa.components.data_validation import DataValidation
 from us_visa.logger import logging
 from us_visa.exception import USVisaException
 import sys
+from typing import Callable, Optional
+from us_visa.constants import TRAINING_PIPELINE_STAGES
 from us_visa.components.data_ingestion import DataIngestion
 from us_visa.components.data_validation import DataValidation
 from us_visa.components.data_transformation import DataTransformation
 from us_visa.components.model_trainer import ModelTrainer
 from us_visa.components.model_evaluation import ModelEvaluation
 from us_visa.components.model_pusher import ModelPusher
+from us_visa.utils.artifact_writer import ArtifactWriter
 
-from us_visa.entity.config_entity import (DataIngestionConfig, 
+from us_visa.entity.config_entity import (TrainingPipeLineConfig,
+                                          DataIngestionConfig, 
                                           DataValidationConfig,
                                           DataTransformationConfig,
                                           ModelTrainerConfig,
@@ -27,13 +31,34 @@ from us_visa.entity.artifact_entity import (DataInjectionArtifact,
 
 
 class TrainPipeline:
-    def __init__(self):
-        self.data_ingestion_config = DataIngestionConfig()
-        self.data_validation_config = DataValidationConfig()
-        self.data_transformation_config = DataTransformationConfig()
-        self.model_trainer_config = ModelTrainerConfig()
+    STAGES = TRAINING_PIPELINE_STAGES
+    
+    def __init__(self, training_pipeline_config: Optional[TrainingPipeLineConfig] = None,
+                 progress_callback: Optional[Callable[[str], None]] = None, full_resync: bool = False):
+        """
+        :param training_pipeline_config: Configuration of this run, a new one (fresh timestamp and
+                                         artifact directory) is created when None
+        :param progress_callback: Called with the name of every stage when it starts
+        :param full_resync: Rebuild the feature store from the whole collection instead of ingesting new documents only
+        """
+        if training_pipeline_config is None:
+            training_pipeline_config = TrainingPipeLineConfig()
+        self.training_pipeline_config = training_pipeline_config
+        self.progress_callback = progress_callback
+        artifact_dir = training_pipeline_config.artifact_dir
+        self.data_ingestion_config = DataIngestionConfig(artifact_dir=artifact_dir, full_resync=full_resync)
+        self.data_validation_config = DataValidationConfig(artifact_dir=artifact_dir)
+        self.data_transformation_config = DataTransformationConfig(artifact_dir=artifact_dir)
+        self.model_trainer_config = ModelTrainerConfig(artifact_dir=artifact_dir)
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig()
+        # created by run_pipeline, the stages write their files inline when they are started on their own
+        self.artifact_writer: Optional[ArtifactWriter] = None
+        
+    def report_progress(self, stage: str) -> None:
+        logging.info(f"Starting {stage} stage of TrainPipeline.")
+        if self.progress_callback is not None:
+            self.progress_callback(stage)
         
 
     def start_data_ingestion(self) -> DataInjectionArtifact:
@@ -44,7 +69,8 @@ class TrainPipeline:
         try:
             logging.info("Entered the start_data_ingestion method of TrainPipeline class.")
             logging.info("Getting the data from mongodb.")
-            data_ingestion = DataIngestion(data_ingestion_config= self.data_ingestion_config)
+            data_ingestion = DataIngestion(data_ingestion_config= self.data_ingestion_config,
+                                           artifact_writer=self.artifact_writer)
             data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
             logging.info("Got the train_set and test_set from mongodb")
             logging.info("Exited the start_data_ingestion of TrainPipeline class.")
@@ -80,7 +106,8 @@ class TrainPipeline:
         try:
             data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
                                                     data_transformation_config=self.data_transformation_config,
-                                                    data_validation_artifact=data_validation_artifact)
+                                                    data_validation_artifact=data_validation_artifact,
+                                                    artifact_writer=self.artifact_writer)
             
             data_transformation_artifact = data_transformation.initiate_data_transformation()
             
@@ -96,7 +123,8 @@ class TrainPipeline:
         
         try:
             model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config = self.model_trainer_config)
+                                         model_trainer_config = self.model_trainer_config,
+                                         artifact_writer=self.artifact_writer)
             model_trainer_artifact = model_trainer.initiate_model_trainer()
             return model_trainer_artifact
         except Exception as e:
@@ -162,20 +190,31 @@ class TrainPipeline:
         """
         This method of TrainPipeline class is responsible for running complete pipeline
         """
+        if self.training_pipeline_config.in_memory_artifacts:
+            self.artifact_writer = ArtifactWriter()
         try:
+            self.report_progress("data_ingestion")
             data_ingestion_artifact = self.start_data_ingestion()
+            self.report_progress("data_validation")
             data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
+            self.report_progress("data_transformation")
             data_transformation_artifact = self.start_data_transformation(
                 data_ingestion_artifact=data_ingestion_artifact,
                 data_validation_artifact=data_validation_artifact)
+            self.report_progress("model_trainer")
             model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
+            self.report_progress("model_evaluation")
             model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact= data_ingestion_artifact,
                                                                     model_trainer_artifact= model_trainer_artifact)
+            if self.artifact_writer is not None:
+                # every artifact file of the run is on disk before the model file gets pushed
+                self.artifact_writer.flush()
             
             # logging.info(f"is model accepted?[{ model_evaluation_artifact.is_model_accepted}]")
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f"Model not accepted.")
                 return None
+            self.report_progress("model_pusher")
             model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
             
             # if not model_evaluation_artifact.is_model_accepted:
@@ -185,4 +224,7 @@ class TrainPipeline:
         
         except Exception as e:
             raise USVisaException(e,sys) from e
-    
\ No newline at end of file
+        finally:
+            if self.artifact_writer is not None:
+                self.artifact_writer.close()
+                self.artifact_writer = None
@@ -0,0 +1,57 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List
+
+from us_visa.logger import logging
+
+
+class ArtifactWriter:
+    """
+    Writes the artifact files of a training run. In background mode the writes run, in submission order,
+    on a single worker thread, so a stage hands its outputs to the next stage in memory and does not wait
+    for the disk; the files are still written for audit and for resuming a run. Otherwise every write
+    happens inside submit.
+    """
+
+    def __init__(self, background: bool = True):
+        """
+        :param background: Write on a worker thread instead of inside submit
+        """
+        self.background = background
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact_writer") if background else None
+        self._futures: List[Future] = []
+
+    def submit(self, write: Callable, *args, **kwargs) -> None:
+        """
+        Schedules write(*args, **kwargs). The objects passed must not be modified afterwards.
+        """
+        if self._executor is None:
+            write(*args, **kwargs)
+            return
+        self._futures.append(self._executor.submit(write, *args, **kwargs))
+
+    def flush(self) -> None:
+        """
+        Method Name: flush
+        Description: Waits for every write submitted so far
+
+        Output: None, all the files submitted are on disk
+        On Failure: Raise the error of the first write that failed, after waiting for the others
+        """
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        """
+        Waits for the pending writes and stops the worker thread. Errors of the pending writes are only
+        logged, close runs when the run already failed or has flushed.
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            logging.info(f"Artifact write failed: {e}")
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
@@ -2,7 +2,7 @@ import os
 import sys
 
 import numpy as np
-import dill
+import pandas as pd
 import yaml
 from pandas import DataFrame
 
@@ -35,6 +35,8 @@ def load_object(file_path: str) -> object:
     logging.info("Entered the load_object method of utils")
 
     try:
+        # dill is only needed by training and batch jobs, keep it out of the serving imports
+        import dill
 
         with open(file_path, "rb") as file_obj:
             obj = dill.load(file_obj)
@@ -78,6 +80,8 @@ def save_object(file_path: str, obj: object) -> None:
     logging.info("Entered the save_object method of utils")
 
     try:
+        import dill
+
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
@@ -104,4 +108,94 @@ def drop_columns(df: DataFrame, cols: list)-> DataFrame:
         
         return df
     except Exception as e:
-        raise USVisaException(e, sys) from e
\ No newline at end of file
+        raise USVisaException(e, sys) from e
+
+# pandas dtypes of the text column types of schema.yaml
+SCHEMA_TEXT_DTYPES = {"category": "category", "string": "string[pyarrow]"}
+
+
+def get_schema_read_dtypes(schema_config: dict) -> dict:
+    """
+    dtype argument of pd.read_csv for the text columns of schema.yaml, so that they are never held as objects
+    schema_config: content of schema.yaml
+    """
+    return {column: SCHEMA_TEXT_DTYPES[dtype] for entry in schema_config["columns"]
+            for column, dtype in entry.items() if dtype in SCHEMA_TEXT_DTYPES}
+
+
+def apply_schema_dtypes(df: DataFrame, schema_config: dict) -> DataFrame:
+    """
+    Casts the columns listed in the columns section of schema.yaml:
+    category columns become pandas categoricals, string columns (unique keys such as case_id, for which
+    a categorical is larger than the objects) pyarrow strings, int columns the smallest integer type holding them.
+    An int column with missing or fractional values (prevailing_wage) and a float column become float32
+    only where every value survives the cast, otherwise they stay float64.
+    df: pandas DataFrame
+    schema_config: content of schema.yaml
+    """
+    try:
+        df = df.copy(deep=False) # the columns are replaced, not written to, so df is left as it was
+        for entry in schema_config["columns"]:
+            for column, dtype in entry.items():
+                if column not in df.columns:
+                    continue
+                if dtype in SCHEMA_TEXT_DTYPES:
+                    df[column] = df[column].astype(SCHEMA_TEXT_DTYPES[dtype])
+                elif dtype in ("int", "float"):
+                    values = pd.to_numeric(df[column])
+                    if dtype == "int" and values.notna().all() and (values % 1 == 0).all():
+                        values = pd.to_numeric(values.astype(np.int64), downcast="integer")
+                    elif values.dtype == np.float64 or (dtype == "float" and values.dtype.kind == "i"):
+                        float32_values = values.astype(np.float32)
+                        if float32_values.astype(np.float64).equals(values.astype(np.float64)):
+                            values = float32_values
+                    df[column] = values
+        return df
+    except Exception as e:
+        raise USVisaException(e, sys) from e
+
+
+def save_dataframe(file_path: str, df: DataFrame, compression: str = None) -> None:
+    """
+    Saves a DataFrame in the format of the file extension: .parquet, .feather or .csv
+    file_path: str location of file to save
+    compression: codec of parquet/feather files (e.g. zstd, snappy, lz4), None for the format default
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        extension = os.path.splitext(file_path)[1]
+        if extension == ".parquet":
+            df.to_parquet(file_path, index=False, compression=compression or "snappy")
+        elif extension == ".feather":
+            df.reset_index(drop=True).to_feather(file_path, compression=compression)
+        elif extension == ".csv":
+            df.to_csv(file_path, index=False, header=True)
+        else:
+            raise ValueError(f"Unsupported file format: {file_path}")
+    except Exception as e:
+        raise USVisaException(e, sys) from e
+
+
+def load_dataframe(file_path: str, schema_config: dict = None) -> DataFrame:
+    """
+    Loads a DataFrame saved by save_dataframe, parquet and feather files keep their dtypes
+    file_path: str location of file to load
+    schema_config: content of schema.yaml, csv files are read with its dtypes when given
+    """
+    try:
+        extension = os.path.splitext(file_path)[1]
+        # string columns come back as the pyarrow strings they were saved as, not as python strings
+        if extension == ".parquet":
+            with pd.option_context("mode.string_storage", "pyarrow"):
+                return pd.read_parquet(file_path)
+        if extension == ".feather":
+            with pd.option_context("mode.string_storage", "pyarrow"):
+                return pd.read_feather(file_path)
+        if extension == ".csv":
+            if schema_config is None:
+                return pd.read_csv(file_path)
+            return apply_schema_dtypes(pd.read_csv(file_path, dtype=get_schema_read_dtypes(schema_config)),
+                                       schema_config)
+        raise ValueError(f"Unsupported file format: {file_path}")
+    except Exception as e:
+        raise USVisaException(e, sys) from e